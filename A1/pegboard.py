@@ -62,6 +62,44 @@ def member(x, L):
     BOARD_ROWS = 4
     BOARD_COLS = 4
 
+# -----------------------------------------------------------------
+# Jump tables, built once per (BOARD_ROWS, BOARD_COLS)
+# -----------------------------------------------------------------
+# Every legal jump on the board is stored as (pegs, hole, flip, moveVector),
+# where pegs = jumper | goner bits, hole = newpos bit and flip = all three.
+# The jump can be made from numeric state s when
+#     s & pegs == pegs   and   s & hole == 0
+# and making it gives s ^ flip.
+# -----------------------------------------------------------------
+
+DIRECTIONS = [[0, 1], [1, 1], [1, 0], [1, -1],
+              [0, -1], [-1, 0], [-1, -1], [-1, 1]]
+
+JUMP_TABLES = {}
+
+
+def jumpTable(rows, cols):
+    # -----------------------------------------------------------------
+    # Returns the list of (pegs, hole, flip, moveVector) entries for a
+    # board of the given size, building it on first use.
+    # -----------------------------------------------------------------
+    key = (rows, cols)
+    if key not in JUMP_TABLES:
+        table = []
+        for x in range(rows):
+            for y in range(cols):
+                for dx, dy in DIRECTIONS:
+                    if 0 <= x + (dx * 2) < rows and 0 <= y + (dy * 2) < cols:
+                        jumper = (x * cols) + y
+                        goner = ((x + dx) * cols) + (y + dy)
+                        newpos = ((x + (dx*2)) * cols) + (y + (dy*2))
+                        pegs = (1 << jumper) | (1 << goner)
+                        hole = 1 << newpos
+                        table.append((pegs, hole, pegs | hole,
+                                      [jumper, goner, newpos]))
+        JUMP_TABLES[key] = table
+    return JUMP_TABLES[key]
+
 # --------------------------------------------------------------------------------
 
 
@@ -113,44 +151,13 @@ class State:
         return "{} {} {} {}".format(outstr[0:4], outstr[4:8], outstr[8:12], outstr[12:16])
 
     def applicableRules(self):
-        line = str(bin(self.numeric))[2:]
-        result = [line[i:i+4] for i in range(0, len(line), 4)]
-        final = []
-        test = [[0, 1], [1, 1], [1, 0], [1.-1], [0, -1], [-1, 0], [-1, -1], [-1, 1]]
-        rules = []
-        for i in range(0, len(result)):
-            lst = [x for x in result[i]]
-            final.append(lst)
-        # mapper = {
-        #     15 : "0",
-        #     14 : "1",
-        #     13 : "2",
-        #     12 : "3",
-        #     11 : "4",
-        #     10 : "5",
-        #     9 : "6",
-        #     8 : "7",
-        #     7 : "8",
-        #     6 : "9",
-        #     5 : "A",
-        #     4 : "B",
-        #     3 : "C",
-        #     2 : "D",
-        #     1 : "E",
-        #     0 : "F",
-        # }
-
-        for x in range(0, len(final)):
-            for y in range(0, len(final[x])):
-                for dx, dy in [[0, 1], [1, 1], [1, 0], [1,-1], [0, -1], [-1, 0], [-1, -1], [-1, 1]]:
-                    if (0 <= y + (dy * 2) <= (BOARD_COLS - 1) and 0 <= x + (dx * 2) <= (BOARD_ROWS - 1)): #Checks if the jumps are valid
-                        jumper = (x * BOARD_ROWS) + y
-                        goner = ((x + dx) * BOARD_ROWS) + (y + dy)
-                        newpos = ((x + (dx*2)) * BOARD_ROWS) + (y + (dy*2))
-                        rule = Rule([jumper, goner, newpos])
-                        if rule.precondition(State(self.numeric)):
-                            rules.append([jumper,goner,newpos])
-        return rules
+        # -----------------------------------------------------------------
+        # Returns the move vectors of all jumps that can be made in this
+        # state, testing each precomputed jump with two AND operations.
+        # -----------------------------------------------------------------
+        s = self.numeric
+        return [move for pegs, hole, flip, move in jumpTable(self.ROWS, self.COLS)
+                if s & pegs == pegs and not s & hole]
 
     def goal(self):
         # -----------------------------------------------------------------
@@ -198,29 +205,20 @@ class Rule:
 
     def applyRule(self, state):
         # -----------------------------------------------------------------
-        # Returns a new state formed by applying rule to state.
+        # Returns a new state formed by applying rule to state.  The
+        # jumper and goner bits are set and the newpos bit is clear, so a
+        # single XOR moves the peg and removes the one jumped over.
         # -----------------------------------------------------------------
-        # print('numeric', state.numeric)
-        x = state.numeric - (2 ** (int(self.jumper))) - (2 ** (int(self.goner))) + (2 ** int(self.newpos)) 
-        newState = State(x)
-        return newState
+        flip = (1 << self.jumper) | (1 << self.goner) | (1 << self.newpos)
+        return State(state.numeric ^ flip)
 
     def precondition(self, state):
-        final = str(bin(state.numeric))[2:]
-        final = final.zfill(16)           
-        # print('this is final',final)
-        # print(self.jumper,self.goner,final[self.newpos]) 
-        # result = [line[i:i+4] for i in range(0, len(line), 4)]
-        # final = []
-
-        # for i in range(0, len(result)):
-        #     lst = [x for x in result[i]]
-        #     final.append(lst)
-        if final[self.jumper] == '1' and final[self.goner] == '1' and final[self.newpos] == '0':
-            return True
-
-        return False
-    
+        # -----------------------------------------------------------------
+        # Jumper and goner positions hold pegs, newpos is empty.
+        # -----------------------------------------------------------------
+        pegs = (1 << self.jumper) | (1 << self.goner)
+        return state.numeric & pegs == pegs and not state.numeric & (1 << self.newpos)
+
 def flailWildly(state):
     # print("HERE",state.numeric)
     newstate = copy.deepcopy(state)
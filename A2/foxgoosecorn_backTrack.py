@@ -17,7 +17,10 @@
 import random
 import sys
 import getopt
-import copy
+import collections
+import itertools
+import json
+from searchtrace import Trace
 
 # ============================================================================
 # get_arg() returns command line arguments.
@@ -46,66 +49,276 @@ def member(x, L):
     return x in L
 
 
+# -----------------------------------------------------------------
+# River-crossing puzzles
+# -----------------------------------------------------------------
+# A puzzle is described by a declarative spec:
+#     items    : names of everything that has to cross
+#     boat     : the item the boat always travels with (the farmer), or
+#                None when anyone may take it, in which case the boat's
+#                bank is kept as one more bit
+#     capacity : most items in the boat at once, rower included
+#     rowers   : items that can take the boat across (default: the boat
+#                item, or everyone)
+#     groups   : names for sets of items, usable in the rules
+#     rules    : what may not be left together on a bank, as
+#                  "A eats B when C is absent"  (any A with any B and no C)
+#                  "A eats B"                   (never together)
+#                  "A outnumber B"              (some B, and more A than B)
+#                where A, B and C are items or groups
+#
+# A state is an integer with bit i set when item i (or the boat, bit
+# len(items)) is on the left bank.  Each rule is compiled into masks,
+# so testing a bank is a few AND operations, and the legal boat loads
+# of a bank are produced lazily as combinations of the items on it.
+# Puzzles with at most 2**COMPILE_LIMIT states are compiled completely
+# at startup into
+#     feasts      : bitmask with bit s set when state s is a feast
+#     table       : table[s] is the list of (rule, t) pairs, t being the
+#                   state reached by applying rule to s
+# so a search never builds a rule or state just to test it.
+# -----------------------------------------------------------------
+
+COMPILE_LIMIT = 16
+
+FOX_GOOSE_CORN = {
+    "items": ["farmer", "fox", "goose", "corn"],
+    "boat": "farmer",
+    "capacity": 2,
+    "rules": ["fox eats goose when farmer is absent",
+              "goose eats corn when farmer is absent"],
+}
+
+MISSIONARIES_CANNIBALS = {
+    "items": ["missionary1", "missionary2", "missionary3",
+              "cannibal1", "cannibal2", "cannibal3"],
+    "boat": None,
+    "capacity": 2,
+    "groups": {"missionaries": ["missionary1", "missionary2", "missionary3"],
+               "cannibals": ["cannibal1", "cannibal2", "cannibal3"]},
+    "rules": ["cannibals outnumber missionaries"],
+}
+
+
+def toBits(leftBank):
+    return sum(b << i for i, b in enumerate(leftBank))
+
+
+def toLeftBank(bits, count):
+    return [bits >> i & 1 for i in range(count)]
+
+
+class Puzzle:
+
+    # ----------------------------------------------------------------------------
+    # Puzzle:
+    # ----------------------------------------------------------------------------
+    # A compiled river-crossing spec.  names are the items, followed by
+    # "boat" if the boat has a bit of its own (ownBoat); full has a bit
+    # for each, itemMask one for each item, and boatMask is the bit that
+    # follows the boat.
+    # ----------------------------------------------------------------------------
+
+    def __init__(self, spec):
+        self.items = list(spec["items"])
+        self.names = list(self.items)
+        if spec.get("boat") is None:
+            self.names.append("boat")
+            self.boatMask = 1 << len(self.items)
+        else:
+            self.boatMask = 1 << self.items.index(spec["boat"])
+        self.ownBoat = spec.get("boat") is None
+        self.full = (1 << len(self.names)) - 1
+        self.itemMask = (1 << len(self.items)) - 1
+        self.capacity = spec.get("capacity", 2)
+
+        masks = {name: 1 << i for i, name in enumerate(self.items)}
+        for group, members in spec.get("groups", {}).items():
+            masks[group] = toBits([1 if name in members else 0 for name in self.items])
+        self.masks = masks
+
+        rowers = spec.get("rowers")
+        if rowers is None:
+            self.rowerMask = self.itemMask if self.ownBoat else self.boatMask
+        else:
+            self.rowerMask = toBits([1 if name in rowers else 0 for name in self.items])
+
+        self.eats = []
+        self.outnumbers = []
+        for text in spec.get("rules", []):
+            self.parseRule(text)
+
+        self.rules = {}
+        self.table = None
+        self.feasts = None
+        if len(self.names) <= COMPILE_LIMIT:
+            feasts = 0
+            for s in range(1 << len(self.names)):
+                if self.isFeast(s):
+                    feasts |= 1 << s
+            self.feasts = feasts
+            self.table = [list(self.moves(s)) for s in range(1 << len(self.names))]
+
+    def parseRule(self, text):
+        # -----------------------------------------------------------------
+        # Adds a rule of one of the forms
+        #    A eats B
+        #    A eats B when C is absent
+        #    A eats B when C and D are absent
+        #    A outnumber B
+        # where A, B, C ... are items or groups.
+        # -----------------------------------------------------------------
+        words = text.split()
+
+        def mask(name):
+            if name not in self.masks:
+                raise ValueError("Cannot parse rule: %s (unknown name %s)" % (text, name))
+            return self.masks[name]
+
+        if len(words) == 3 and words[1] == "eats":
+            self.eats.append((mask(words[0]), mask(words[2]), 0))
+        elif len(words) >= 6 and words[1] == "eats" and words[3] == "when" and \
+                words[-1] == "absent":
+            guards = words[4:-2]
+            verb = "is" if len(guards) == 1 else "are"
+            if words[-2] != verb or len(guards) % 2 == 0 or \
+                    guards[1::2] != ["and"] * (len(guards) // 2):
+                raise ValueError("Cannot parse rule: %s" % text)
+            guard = 0
+            for name in guards[0::2]:
+                guard |= mask(name)
+            self.eats.append((mask(words[0]), mask(words[2]), guard))
+        elif len(words) == 3 and words[1] in ("outnumber", "outnumbers"):
+            self.outnumbers.append((mask(words[0]), mask(words[2])))
+        else:
+            raise ValueError("Cannot parse rule: %s" % text)
+
+    def bankFeast(self, bank):
+        # -----------------------------------------------------------------
+        # True if something is eaten on a bank holding the items in bank.
+        # -----------------------------------------------------------------
+        for predator, prey, guard in self.eats:
+            if bank & predator and bank & prey and not bank & guard:
+                return True
+        for many, few in self.outnumbers:
+            if bank & few and bin(bank & many).count("1") > bin(bank & few).count("1"):
+                return True
+        return False
+
+    def isFeast(self, s):
+        if self.feasts is not None:
+            return self.feasts >> s & 1 == 1
+        return self.bankFeast(s & self.itemMask) or self.bankFeast(~s & self.itemMask)
+
+    def loads(self, bank):
+        # -----------------------------------------------------------------
+        # Generates the masks of the boat loads that can leave a bank
+        # holding the items in bank: up to capacity items, with a rower,
+        # and with the boat's own item if it has one.
+        # -----------------------------------------------------------------
+        items = [1 << i for i in range(len(self.items)) if bank >> i & 1]
+        for size in range(1, self.capacity + 1):
+            for combination in itertools.combinations(items, size):
+                load = sum(combination)
+                if load & self.rowerMask and (self.ownBoat or load & self.boatMask):
+                    yield load
+
+    def rule(self, load, leftToRight):
+        key = (load, leftToRight)
+        if key not in self.rules:
+            sign = -1 if leftToRight else 1
+            self.rules[key] = Rule([sign if load >> i & 1 else 0
+                                    for i in range(len(self.items))], self)
+        return self.rules[key]
+
+    def moves(self, s):
+        # -----------------------------------------------------------------
+        # Generates the (rule, t) pairs of the legal crossings from s.
+        # -----------------------------------------------------------------
+        leftToRight = s & self.boatMask != 0
+        bank = s if leftToRight else self.full ^ s
+        boat = self.boatMask if self.ownBoat else 0
+        for load in self.loads(bank & self.itemMask):
+            t = s ^ load ^ boat
+            if not self.isFeast(t):
+                yield self.rule(load, leftToRight), t
+
+    def checkLeftBank(self, leftBank):
+        # -----------------------------------------------------------------
+        # Raises ValueError unless leftBank has one 0 or 1 for each item,
+        # and optionally one for the boat.
+        # -----------------------------------------------------------------
+        if len(leftBank) not in (len(self.items), len(self.names)) or \
+                any(b not in (0, 1) for b in leftBank):
+            raise ValueError("expected %d bits of 0 or 1" % len(self.items))
+
+    def transitions(self, s):
+        if self.table is not None:
+            return self.table[s]
+        return list(self.moves(s))
+
+
 # --------------------------------------------------------------------------------
 class State:
 
     # ----------------------------------------------------------------------------
     # State:
     # ----------------------------------------------------------------------------
-    # The state is a 4-tuple containing the number of each kind of
-    # occupant on the left bank (rive gauche).  Specifically, it is
-    # [#farmers,#foxes,#geese,#corn], where the number can be either
-    # 0 or 1
+    # The state records which occupants are on the left bank (rive gauche).
+    # It is built from the list [#farmers,#foxes,#geese,#corn] (in general,
+    # one entry per item of PUZZLE, and optionally one for the boat),
+    # where the number can be either 0 or 1, or directly from its bit
+    # encoding, and is stored as that encoding in bits.  A boat with a bit
+    # of its own starts on the left bank unless given.  puzzle defaults to
+    # PUZZLE.
     # ----------------------------------------------------------------------------
 
-    def __init__(self, leftBank):
-        self.leftBank = leftBank
+    def __init__(self, leftBank, puzzle=None):
+        if puzzle is None:
+            puzzle = PUZZLE
+        if isinstance(leftBank, int):
+            self.bits = leftBank
+        else:
+            self.bits = toBits(leftBank)
+            if len(leftBank) < len(puzzle.names):
+                self.bits |= puzzle.boatMask
+        self.PUZZLE = puzzle
+
+    @property
+    def leftBank(self):
+        return toLeftBank(self.bits, len(self.PUZZLE.names))
+
+    def __eq__(self, state):
+        return self.bits == state.bits
+
+    def __hash__(self):
+        return self.bits
 
     def __str__(self):
-        name = ["farmer", "fox", "goose", "corn"]
-        description = "[["
-        for i in range(len(self.leftBank)):  # occupants of left bank
-            if self.leftBank[i] == 1:
-                description = description + " " + name[i]
-        description += " ]["
-        for i in range(len(self.leftBank)):  # occupants of left bank
-            if self.leftBank[i] == 0:
-                description = description + " " + name[i]
-        description += " ]]"
-        return description
+        names = self.PUZZLE.names
+        left = [names[i] for i in range(len(names)) if self.bits >> i & 1]
+        right = [names[i] for i in range(len(names)) if not self.bits >> i & 1]
+        return "[[" + "".join(" " + n for n in left) + " ][" + \
+            "".join(" " + n for n in right) + " ]]"
 
     def feast(self):
         # -----------------------------------------------------------------
         # Returns True if this state represents a "feasting" state
         # -----------------------------------------------------------------
-        if self.leftBank[0] == 1 and self.leftBank[1] == 0 and self.leftBank[2] == 0:
-            return True
-        if self.leftBank[0] == 1 and self.leftBank[2] == 0 and self.leftBank[3] == 0:
-            return True
-        if self.leftBank[0] == 0 and self.leftBank[1] == 1 and self.leftBank[2] == 1:
-            return True
-        if self.leftBank[0] == 0 and self.leftBank[2] == 1 and self.leftBank[3] == 1:
-            return True
-
-        return False
+        return self.PUZZLE.isFeast(self.bits)
 
     def applicableRules(self):
         # -----------------------------------------------------------------
         # Find all applicable rules for a given state
         # -----------------------------------------------------------------
-        result = []
-        for r in Rule.ALL_RULES:
-            rule = Rule(r)
-            if rule.precondition(self):
-                result.append(rule)
-        return result
+        return [rule for rule, t in self.PUZZLE.transitions(self.bits)]
 
     def goal(self):
         # -----------------------------------------------------------------
         # The goal is to get all occupants to the right bank, so the
         # desired final state is [0,0,0,0]
         # -----------------------------------------------------------------
-        return self.leftBank == [0, 0, 0, 0]
+        return self.bits == 0
 
 
 # --------------------------------------------------------------------------------
@@ -114,38 +327,34 @@ class Rule:
     # ----------------------------------------------------------------------------
     # Rule:
     # ----------------------------------------------------------------------------
-    # A rule is a 4-tuple containing the number of each kind of
-    # occupant to move from the left bank to the right bank (rive
-    # droite).  Specifically, it is [#farmers,#foxes,#geese,#corn],
-    # where the number can be -1, 0 or 1.  (-1 indicates the movement
-    # is from right to left - a rule can be applied by adding it to
-    # the state.
+    # A rule is a tuple containing the number of each kind of occupant
+    # to move from the left bank to the right bank (rive droite), e.g.
+    # [#farmers,#foxes,#geese,#corn], where the number can be -1, 0 or 1.
+    # (-1 indicates the movement is from left to right - a rule can be
+    # applied by adding it to the state.  mask has a bit set for each
+    # occupant that moves, and for the boat, and since a legal move takes
+    # them all to the other bank, applying it flips those bits.
     # ----------------------------------------------------------------------------
 
-    ALL_RULES = [[-1, 0, 0, 0], [-1, -1, 0, 0], [-1, 0, -1, 0], [-1, 0, 0, -1],
-                 [1, 0, 0, 0], [1, 1, 0, 0], [1, 0, 1, 0], [1, 0, 0, 1]]
-
-    def __init__(self, moveVector):
+    def __init__(self, moveVector, puzzle=None):
+        if puzzle is None:
+            puzzle = PUZZLE
         self.moveVector = moveVector
+        self.mask = toBits([1 if v else 0 for v in moveVector]) | puzzle.boatMask
+        self.leftToRight = -1 in moveVector
+        self.PUZZLE = puzzle
 
     def __str__(self):
-        name = ["farmer", "fox", "goose", "corn"]
+        name = self.PUZZLE.items
 
         fromBank = "Left"
         toBank = "Right"
-        if self.moveVector[0] == 1:
+        if not self.leftToRight:
             fromBank = "Right"
             toBank = "Left"
 
-        item = ""
-        for i in range(1, len(self.moveVector)):
-            if self.moveVector[i] == self.moveVector[0]:
-                item = name[i]
-
-        if item != "":
-            item = " and " + item
-
-        description = "Move farmer" + item + " from " + fromBank + " to " + toBank
+        movers = [name[i] for i in range(len(self.moveVector)) if self.moveVector[i]]
+        description = "Move " + " and ".join(movers) + " from " + fromBank + " to " + toBank
         return description
 
     def __eq__(self, r):
@@ -154,62 +363,206 @@ class Rule:
 
     def applyRule(self, state):
         # ============================================================================
-        # Returns a new state formed by applying rule to state.
+        # Returns a new state formed by applying rule to state, which must
+        # satisfy the precondition.
         # ============================================================================
-        result = [None]*len(state.leftBank)  # create array of desired size
-        for i in range(len(state.leftBank)):
-            result[i] = state.leftBank[i] + self.moveVector[i]
-        return State(result)
+        return State(state.bits ^ self.mask, state.PUZZLE)
 
     def precondition(self, state):
         # ============================================================================
-        # Determines whether word can be placed in the grid using the given rule, by
-        # examining the placement of each letter.  A letter can be placed in a cell
-        # if it is either empty, or already contains the same letter.
+        # Determines whether the rule can be applied to state: everything it
+        # moves is on the bank it moves from, and no feast results.
         # ============================================================================
-        temp = self.applyRule(state)
-        for i in temp.leftBank:
-            if i < 0 or i > 1:   # illegal state produced; can't apply rule
-                return False
-        return not temp.feast()  # legal state produced, but is there a feast?
-
-
-path = []
-
-
-def backTrack(stateList, verbose):
-    first = stateList[0]
-    maxrecurse = 16
-    if first in stateList[1:]:
-        return 'FAILED - 1'
-    if first.goal():
-        return "GOALLLLL"
-    if maxrecurse < len(stateList):
-        return "FAILED - 2 : Max Depth Exceded"
-
-    rules = first.applicableRules()
-
-    if not rules:
-        return "FAILED - 3 : No applicable rules"
-
-    for r in rules:
-        newState = r.applyRule(first)
-        newStatelist = copy.deepcopy(stateList)
-        newStatelist.insert(0, newState)
-        X = backTrack(newStatelist, verbose)
-        if verbose:
-            print(r)
-            print(newState)
-            print(X)
-            print(newState)
-        if 'FAILED' not in X:
-            path.append([r, newState])
-            return path
-    return "FAILED - 4"
+        return any(rule == self for rule, t in self.PUZZLE.transitions(state.bits))
+
+
+PUZZLE = Puzzle(FOX_GOOSE_CORN)
+
+
+
+def breadthFirst(initialState, trace=None):
+    # -----------------------------------------------------------------
+    # Returns the shortest plan from initialState to the goal as a new
+    # list of [rule, state reached] pairs, first move first ([] if
+    # initialState is the goal), or None if the goal cannot be reached.
+    #
+    # parent[s] is the state s was first reached from (-1 if not yet
+    # reached) and via[s] the rule used; both are indexed by the bits of
+    # s, in lists when the puzzle is compiled and dicts otherwise, and
+    # are local to the call, so the search can be repeated freely.
+    # If trace (a searchtrace.Trace) is given, each state expanded is
+    # recorded in it with its depth.
+    # -----------------------------------------------------------------
+    puzzle = initialState.PUZZLE
+    start = initialState.bits
+    if puzzle.table is not None:
+        parent = [-1] * (puzzle.full + 1)
+        via = [None] * (puzzle.full + 1)
+    else:
+        parent = collections.defaultdict(lambda: -1)
+        via = {}
+    parent[start] = start
+
+    frontier = [start]
+    depth = 0
+    while frontier and parent[0] == -1:
+        nextFrontier = []
+        for s in frontier:
+            if trace:
+                trace.record(depth, State(s, puzzle))
+            for r, t in puzzle.transitions(s):
+                if parent[t] == -1:
+                    parent[t] = s
+                    via[t] = r
+                    nextFrontier.append(t)
+        frontier = nextFrontier
+        depth += 1
+
+    if parent[0] == -1:
+        return None
+    plan = []
+    s = 0
+    while s != start:
+        plan.append([via[s], State(s, puzzle)])
+        s = parent[s]
+    plan.reverse()
+    return plan
+
+
+def solutionOracle(puzzle):
+    # -----------------------------------------------------------------
+    # Returns a dict mapping the bits of every state that can reach the
+    # goal to the first move of a shortest plan from it, as (rule, bits
+    # of the state reached), or None for the goal itself, from a single
+    # breadth-first search backwards from the goal.  oraclePlan follows
+    # these moves to the goal.
+    #
+    # Crossings can always be undone, so the predecessors of a state t
+    # are the states its own transitions lead to; the rule from such an
+    # s to t moves the same load the other way.
+    # -----------------------------------------------------------------
+    nextMoves = {0: None}
+    frontier = [0]
+    while frontier:
+        nextFrontier = []
+        for t in frontier:
+            for r, s in puzzle.transitions(t):
+                if s not in nextMoves:
+                    load = (s ^ t) & puzzle.itemMask
+                    rule = puzzle.rule(load, s & puzzle.boatMask != 0)
+                    nextMoves[s] = (rule, t)
+                    nextFrontier.append(s)
+        frontier = nextFrontier
+    return nextMoves
+
+
+def oraclePlan(puzzle, nextMoves, bits):
+    # -----------------------------------------------------------------
+    # Returns the shortest plan from the state with the given bits, as
+    # breadthFirst would return it, by following the moves of a
+    # solutionOracle, or None if the goal cannot be reached.
+    # -----------------------------------------------------------------
+    if bits not in nextMoves:
+        return None
+    plan = []
+    while nextMoves[bits] is not None:
+        rule, bits = nextMoves[bits]
+        plan.append([rule, State(bits, puzzle)])
+    return plan
+
+
+def answerQueries(puzzle, lines, out):
+    # -----------------------------------------------------------------
+    # Answers one start state per line of lines, given as a JSON list
+    # ([1, 0, 1, 0]) or as bits separated by spaces (1 0 1 0), with one
+    # JSON object per line on out:
+    #    {"start": [...], "moves": n, "plan": [{"move": ..., "state": [...]}]}
+    # with "plan" null when the goal cannot be reached, or
+    #    {"start": [...], "error": ...}
+    # for feast states and lines that cannot be read.  The plans all come
+    # from one solutionOracle, so each query only follows its moves.  out
+    # is flushed after every line, for callers streaming their queries.
+    # -----------------------------------------------------------------
+    nextMoves = solutionOracle(puzzle)
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            leftBank = json.loads(line) if line.startswith("[") else [int(b) for b in line.split()]
+            puzzle.checkLeftBank(leftBank)
+        except ValueError as e:
+            out.write(json.dumps({"start": line, "error": str(e)}) + "\n")
+            out.flush()
+            continue
+        state = State(leftBank, puzzle)
+        answer = {"start": state.leftBank}
+        if state.feast():
+            answer["error"] = "feast"
+        else:
+            plan = oraclePlan(puzzle, nextMoves, state.bits)
+            answer["moves"] = None if plan is None else len(plan)
+            answer["plan"] = None if plan is None else \
+                [{"move": str(r), "state": t.leftBank} for r, t in plan]
+        out.write(json.dumps(answer) + "\n")
+        out.flush()
 
 # --------------------------------------------------------------------------------
 
 
+def getConfiguration():
+    # ============================================================================
+    # Returns configuration read from command line.
+    #   python3 foxgoosecorn_backTrack.py [options] [s1 s2 ... sn]
+    #
+    # -p, --puzzle:
+    #   The puzzle to solve: "fgc" (fox, goose and corn, the default), "mc"
+    #   (three missionaries and three cannibals), or the name of a JSON file
+    #   holding a spec (see Puzzle).
+    #
+    # -q, --queries:
+    #   Batch mode: read start states, one per line, from the named file
+    #   ("-" for standard input) and write their shortest plans as JSON
+    #   lines (see answerQueries).
+    #
+    # The s values give the initial bank of each item, 1 for left and 0 for
+    # right, and default to 1.
+    #
+    # Returns (puzzle, leftBank, queries), queries being None unless -q is
+    # given.
+    # ============================================================================
+    PUZZLES = {"fgc": FOX_GOOSE_CORN, "mc": MISSIONARIES_CANNIBALS}
+    spec = FOX_GOOSE_CORN
+    queries = None
+
+    opts, args = getopt.gnu_getopt(sys.argv[1:], "p:q:", ["puzzle=", "queries="])
+    for opt, arg in opts:
+        if opt in ("-q", "--queries"):
+            queries = arg
+        elif opt in ("-p", "--puzzle"):
+            if arg in PUZZLES:
+                spec = PUZZLES[arg]
+            else:
+                try:
+                    with open(arg) as f:
+                        spec = json.load(f)
+                except (OSError, ValueError) as e:
+                    sys.exit("Cannot read puzzle %s: %s" % (arg, e))
+
+    try:
+        puzzle = Puzzle(spec)
+    except KeyError as e:
+        sys.exit("Bad puzzle spec: missing %s" % e)
+    except (ValueError, TypeError) as e:
+        sys.exit("Bad puzzle spec: %s" % e)
+    try:
+        leftBank = [int(a) for a in args] + [1] * (len(puzzle.items) - len(args))
+        puzzle.checkLeftBank(leftBank)
+    except ValueError as e:
+        sys.exit("Bad initial state %s: %s" % (" ".join(args), e))
+    return puzzle, leftBank, queries
+
+
 # --------------------------------------------------------------------------------
 #  MAIN PROGRAM
 # --------------------------------------------------------------------------------
@@ -228,14 +581,24 @@ if __name__ == "__main__":
     # Sample:
     #    python3 foxgoosecorn_2022.py 0 1 0 1
     # starts the program with initial state [[ fox corn ][ farmer goose ]]
+    #
+    #    python3 foxgoosecorn_backTrack.py -p mc
+    # solves the missionaries and cannibals instead, and
+    #    python3 foxgoosecorn_backTrack.py -q starts.txt
+    # answers every start state in starts.txt.  See getConfiguration().
     # --------------------------------------------------------------------------------
 
-    initFarmer = int(get_arg(1))
-    initFox = int(get_arg(2))
-    initGoose = int(get_arg(3))
-    initCorn = int(get_arg(4))
+    PUZZLE, leftBank, queries = getConfiguration()
+
+    if queries is not None:
+        if queries == "-":
+            answerQueries(PUZZLE, sys.stdin, sys.stdout)
+        else:
+            with open(queries) as f:
+                answerQueries(PUZZLE, f, sys.stdout)
+        sys.exit(0)
 
-    initialState = State([initFarmer, initFox, initGoose, initCorn])
+    initialState = State(leftBank, PUZZLE)
     if initialState.feast():
         print("Feast state, cannot proceed: %s" % initialState)
         sys.exit("")
@@ -277,10 +640,15 @@ if __name__ == "__main__":
     random.seed()  # use clock to randomize RNG
 
     state = initialState
-    backTrack([initialState], True)
-    for i in path:
-        print(i[0], "STATE REACHED:",  i[1])
-        print(i[1].goal())
+    trace = Trace()
+    plan = breadthFirst(initialState, trace)
+    trace.dump()
+    if plan is None:
+        print("No solution from %s" % initialState)
+    else:
+        for i in plan:
+            print(i[0], "STATE REACHED:",  i[1])
+            print(i[1].goal())
     # ============================================================================
     # Flail Wildly strategy
     # ============================================================================
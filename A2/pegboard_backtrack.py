@@ -22,15 +22,28 @@
 # --------------------------------------------------------------------------------
 
 import copy
+import mmap
+import multiprocessing
 from operator import truediv
+import os
 from os import stat
 import random
 from re import X
 from socket import gaierror
 import string
+import struct
 import sys
 import getopt
+import heapq
+import json
 from unicodedata import numeric
+import zlib
+from searchtrace import Trace
+
+try:
+    import numpy as np
+except ImportError:
+    np = None  # only needed for bulkPlayouts, layeredBFS and state graphs
 
 # ============================================================================
 # get_arg() returns command line arguments.
@@ -61,8 +74,691 @@ def member(x, L):
 # -----------------------------------------------------------------
 # Global variables, set at startup
 # -----------------------------------------------------------------
-    BOARD_ROWS = 4
-    BOARD_COLS = 4
+BOARD_ROWS = 4
+BOARD_COLS = 4
+
+# -----------------------------------------------------------------
+# Board geometries
+# -----------------------------------------------------------------
+# A geometry is a set of valid cells (x, y) on a lattice together with
+# the directions a peg may jump in.  Only valid cells are numbered, in
+# order of (x, y), so the numeric state keeps one bit per hole:
+#     "rect"     : BOARD_ROWS x BOARD_COLS, 8 directions (cell (x, y) is
+#                  bit x * BOARD_COLS + y)
+#     "english"  : the 33-hole cross, 4 orthogonal directions
+#     "triangle" : rows x = 0..n-1 with cells y = 0..x (15 holes for
+#                  n = 5), the 6 directions of a triangular lattice
+#     "hex"      : hexagon of side n in axial coordinates (19 holes for
+#                  n = 3), the 6 directions of a hexagonal lattice
+# Geometries are interned by boardGeometry, so one object stands for
+# each board and can key the caches of tables below.
+# -----------------------------------------------------------------
+
+DIRECTIONS = [[0, 1], [1, 1], [1, 0], [1, -1],
+              [0, -1], [-1, 0], [-1, -1], [-1, 1]]
+ORTHOGONAL = [[0, 1], [1, 0], [0, -1], [-1, 0]]
+TRIANGULAR = [[0, 1], [1, 1], [1, 0], [0, -1], [-1, -1], [-1, 0]]
+HEXAGONAL = [[0, 1], [1, 0], [1, -1], [0, -1], [-1, 0], [-1, 1]]
+
+GEOMETRIES = {}
+GEOMETRY_KINDS = ["rect", "english", "triangle", "hex"]
+
+
+class Geometry:
+
+    # ----------------------------------------------------------------------------
+    # Geometry:
+    # ----------------------------------------------------------------------------
+    # cells[i] is the (x, y) of bit i and index maps it back.  ROWS and COLS
+    # give the bounding box, used for printing.  maps are the coordinate
+    # maps of the lattice (rotations and reflections) that symmetries are
+    # chosen from, and axes the coordinates whose extremes are the sides
+    # of the board.  distance[i][j] is the number of single steps in the
+    # jump directions from cell i to cell j.
+    # ----------------------------------------------------------------------------
+
+    def __init__(self, spec, name, cells, directions, maps, axes, hole):
+        self.spec = spec
+        self.name = name
+        self.cells = sorted(cells)
+        self.index = {cell: i for i, cell in enumerate(self.cells)}
+        self.size = len(self.cells)
+        self.ROWS = max(x for x, y in self.cells) + 1
+        self.COLS = max(y for x, y in self.cells) + 1
+        self.directions = directions
+        self.maps = maps
+        self.axes = axes
+        self.hole = hole
+
+        self.neighbours = []
+        for x, y in self.cells:
+            self.neighbours.append([self.index[(x + dx, y + dy)] for dx, dy in directions
+                                    if (x + dx, y + dy) in self.index])
+        self.distance = [self.distancesFrom([i]) for i in range(self.size)]
+
+    def __reduce__(self):
+        # pickled (e.g. for worker processes) as the call that interns it
+        return (boardGeometry, self.spec)
+
+    def distancesFrom(self, sources):
+        # -----------------------------------------------------------------
+        # Breadth-first step distances from the cells in sources.
+        # -----------------------------------------------------------------
+        d = [None] * self.size
+        layer = list(sources)
+        for i in layer:
+            d[i] = 0
+        while layer:
+            nextLayer = []
+            for i in layer:
+                for j in self.neighbours[i]:
+                    if d[j] is None:
+                        d[j] = d[i] + 1
+                        nextLayer.append(j)
+            layer = nextLayer
+        return [self.size if di is None else di for di in d]
+
+
+def boardGeometry(kind="rect", *size):
+    # -----------------------------------------------------------------
+    # Returns the geometry of the given kind ("rect" with rows and cols,
+    # "english", "triangle" or "hex" with the length of a side), building
+    # it on first use.
+    # -----------------------------------------------------------------
+    spec = (kind,) + tuple(size)
+    if spec in GEOMETRIES:
+        return GEOMETRIES[spec]
+
+    if kind == "rect":
+        rows, cols = size
+        cells = [(x, y) for x in range(rows) for y in range(cols)]
+        maps = squareMaps(rows, cols)
+        axes = [lambda x, y: x, lambda x, y: y]
+        geometry = Geometry(spec, "%dx%d" % (rows, cols), cells, DIRECTIONS,
+                            maps, axes, 9 if rows * cols > 9 else rows * cols // 2)
+    elif kind == "english":
+        cells = [(x, y) for x in range(7) for y in range(7)
+                 if 2 <= x <= 4 or 2 <= y <= 4]
+        axes = [lambda x, y: x, lambda x, y: y]
+        geometry = Geometry(spec, "english", cells, ORTHOGONAL,
+                            squareMaps(7, 7), axes, sorted(cells).index((3, 3)))
+    elif kind == "triangle":
+        n = size[0] if size else 5
+        cells = [(x, y) for x in range(n) for y in range(x + 1)]
+        # barycentric coordinates a = y, b = x - y, c = n - 1 - x; the
+        # symmetries permute them
+        axes = [lambda x, y: y, lambda x, y: x - y, lambda x, y: n - 1 - x]
+        maps = []
+        for i, j, k in [(0, 1, 2), (1, 2, 0), (2, 0, 1), (1, 0, 2), (0, 2, 1), (2, 1, 0)]:
+            maps.append(lambda x, y, i=i, j=j, k=k:
+                        (n - 1 - axes[k](x, y), axes[i](x, y)))
+        geometry = Geometry(spec, "triangle%d" % n, cells, TRIANGULAR, maps, axes, 0)
+    elif kind == "hex":
+        n = size[0] if size else 3
+        r = n - 1
+        cells = [(x, y) for x in range(2 * n - 1) for y in range(2 * n - 1)
+                 if r <= x + y <= 3 * r]
+        # cube coordinates q, s, t (summing to 0) centred on the middle
+        # cell; the symmetries permute them, with or without negation
+        axes = [lambda x, y: x - r, lambda x, y: y - r, lambda x, y: 2 * r - x - y]
+        maps = []
+        for sign in (1, -1):
+            for i, j, k in [(0, 1, 2), (1, 2, 0), (2, 0, 1), (1, 0, 2), (0, 2, 1), (2, 1, 0)]:
+                maps.append(lambda x, y, i=i, j=j, sign=sign:
+                            (r + sign * axes[i](x, y), r + sign * axes[j](x, y)))
+        geometry = Geometry(spec, "hex%d" % n, cells, HEXAGONAL, maps, axes,
+                            sorted(cells).index((r, r)))
+    else:
+        raise ValueError("Unknown geometry: %s" % kind)
+
+    GEOMETRIES[spec] = geometry
+    return geometry
+
+
+def squareMaps(rows, cols):
+    # -----------------------------------------------------------------
+    # The rotations and reflections of a rows x cols box, identity first.
+    # Those that do not map the box onto itself are dropped later.
+    # -----------------------------------------------------------------
+    return [lambda x, y: (x, y),
+            lambda x, y: (rows - 1 - x, cols - 1 - y),
+            lambda x, y: (rows - 1 - x, y),
+            lambda x, y: (x, cols - 1 - y),
+            lambda x, y: (y, x),
+            lambda x, y: (cols - 1 - y, rows - 1 - x),
+            lambda x, y: (y, rows - 1 - x),
+            lambda x, y: (cols - 1 - y, x)]
+
+
+BOARD_GEOMETRY = boardGeometry("rect", BOARD_ROWS, BOARD_COLS)
+
+# -----------------------------------------------------------------
+# Jump tables, built once per geometry
+# -----------------------------------------------------------------
+# Every legal jump on the board is stored as (pegs, hole, rule), where
+# pegs = jumperMask | gonerMask and hole = newposMask.  The rule can be
+# applied to a numeric state s when
+#     s & pegs == pegs   and   s & hole == 0
+# and applying it flips all three bits, s ^ rule.flipMask.
+# -----------------------------------------------------------------
+
+JUMP_TABLES = {}
+
+
+def jumpTable(geometry):
+    # -----------------------------------------------------------------
+    # Returns the list of (pegs, hole, rule) entries for a board of the
+    # given geometry, building it on first use.
+    # -----------------------------------------------------------------
+    if geometry not in JUMP_TABLES:
+        table = []
+        index = geometry.index
+        for x, y in geometry.cells:
+            for dx, dy in geometry.directions:
+                if (x + (dx * 2), y + (dy * 2)) in index and (x + dx, y + dy) in index:
+                    jumper = index[(x, y)]
+                    goner = index[(x + dx, y + dy)]
+                    newpos = index[(x + (dx*2), y + (dy*2))]
+                    rule = Rule([jumper, goner, newpos])
+                    table.append((rule.jumperMask | rule.gonerMask,
+                                  rule.newposMask, rule))
+        JUMP_TABLES[geometry] = table
+    return JUMP_TABLES[geometry]
+
+
+CELL_TABLES = {}
+
+
+def cellJumpTables(geometry):
+    # -----------------------------------------------------------------
+    # Returns (byJumper, byNewpos): the jump table entries of the board
+    # grouped by the cell each jump starts from and the cell it lands in.
+    # -----------------------------------------------------------------
+    if geometry not in CELL_TABLES:
+        byJumper = [[] for i in range(geometry.size)]
+        byNewpos = [[] for i in range(geometry.size)]
+        for entry in jumpTable(geometry):
+            byJumper[entry[2].jumper].append(entry)
+            byNewpos[entry[2].newpos].append(entry)
+        CELL_TABLES[geometry] = (byJumper, byNewpos)
+    return CELL_TABLES[geometry]
+
+
+# -----------------------------------------------------------------
+# Board symmetries
+# -----------------------------------------------------------------
+# Each coordinate map of the lattice that takes the valid cells, and
+# the jumps between them, onto themselves is a symmetry of the board:
+# the 8 of D4 for a square or the English cross, 4 for a rectangle, 6
+# for the triangle and 12 for the hexagon.  Each symmetry is a
+# permutation of the cells.  Only symmetries that leave the goal state
+# unchanged may be used, since a board can reach the goal exactly when
+# its image can.
+# -----------------------------------------------------------------
+
+SYMMETRY_TABLES = {}
+
+
+def boardSymmetries(geometry):
+    # -----------------------------------------------------------------
+    # Returns the cell permutations of the board, perm[i] being the cell
+    # that cell i is mapped to.  The identity comes first.
+    # -----------------------------------------------------------------
+    jumps = {tuple(rule.moveVector) for pegs, hole, rule in jumpTable(geometry)}
+    perms = []
+    for m in geometry.maps:
+        images = [m(x, y) for x, y in geometry.cells]
+        if not all(image in geometry.index for image in images):
+            continue
+        perm = [geometry.index[image] for image in images]
+        if all((perm[a], perm[b], perm[c]) in jumps for a, b, c in jumps):
+            perms.append(perm)
+    return perms
+
+
+class Symmetries:
+
+    # ----------------------------------------------------------------------------
+    # Symmetries:
+    # ----------------------------------------------------------------------------
+    # The non-identity symmetries of a board that fix a goal state, stored
+    # as precomputed bit-permutation tables.  The images of a board under
+    # all of them are packed side by side into one integer, each in a field
+    # of `width` bits, and built with one lookup per byte of the board:
+    # tables[k][v] holds the packed images of the bits v << 8k.
+    # ----------------------------------------------------------------------------
+
+    def __init__(self, geometry, goal):
+        self.width = geometry.size
+        self.mask = (1 << self.width) - 1
+        perms = []
+        for perm in boardSymmetries(geometry)[1:]:
+            image = 0
+            for i in range(self.width):
+                if goal >> i & 1:
+                    image |= 1 << perm[i]
+            if image == goal:
+                perms.append(perm)
+        self.count = len(perms)
+
+        self.tables = []
+        for k in range(0, self.width, 8):
+            chunk = []
+            for v in range(256):
+                packed = 0
+                for b in range(8):
+                    if v >> b & 1 and k + b < self.width:
+                        for g in range(self.count):
+                            packed |= 1 << (perms[g][k + b] + g * self.width)
+                chunk.append(packed)
+            self.tables.append(chunk)
+
+    def __len__(self):
+        return self.count
+
+    def canonical(self, numeric):
+        # -----------------------------------------------------------------
+        # Returns the smallest numeric state among numeric and its images.
+        # -----------------------------------------------------------------
+        packed = 0
+        n = numeric
+        for chunk in self.tables:
+            packed |= chunk[n & 255]
+            n >>= 8
+        best = numeric
+        for g in range(self.count):
+            image = packed & self.mask
+            if image < best:
+                best = image
+            packed >>= self.width
+        return best
+
+
+def symmetryGroup(geometry, goal):
+    # -----------------------------------------------------------------
+    # Returns the Symmetries of the board that fix the numeric goal state,
+    # building them on first use.
+    # -----------------------------------------------------------------
+    key = (geometry, goal)
+    if key not in SYMMETRY_TABLES:
+        SYMMETRY_TABLES[key] = Symmetries(geometry, goal)
+    return SYMMETRY_TABLES[key]
+
+
+# -----------------------------------------------------------------
+# Pagoda functions and isolated pegs
+# -----------------------------------------------------------------
+# A pagoda function gives each cell a weight w such that, for every jump,
+# w(jumper) + w(goner) >= w(newpos).  The total weight of the pegs on the
+# board can then never increase, so a board whose total is below that
+# of the goal can be abandoned.
+#
+# If d is any distance with d changing by at most 1 between neighbouring
+# cells, w = FIB[K - d] is a pagoda function, since along a jump d grows
+# by at most 1 and 2 from newpos to goner and jumper, and
+# FIB[n-1] + FIB[n-2] = FIB[n].  Step distances in the jump directions
+# (king moves on a rectangle) from each goal peg, from each corner (the
+# cells with fewest neighbours) and from each side are used.
+#
+# A peg is isolated when no other peg is within 2 * (pegs - 2) + 1 steps
+# of it: each jump carries a peg at most 2 cells and uses up a peg,
+# so the other pegs can never reach it, and a single-peg goal is lost.
+# -----------------------------------------------------------------
+
+PAGODA_TABLES = {}
+
+
+def fibonacci(n):
+    a, b = 0, 1
+    for i in range(n):
+        a, b = b, a + b
+    return a
+
+
+class Pagodas:
+
+    # ----------------------------------------------------------------------------
+    # Pagodas:
+    # ----------------------------------------------------------------------------
+    # The pagoda functions of a board for a given goal, stored as byte
+    # tables whose entries hold the values of every pagoda function packed
+    # side by side in fields of `width` bits.  Each field is offset so that
+    # its top bit is set exactly when the board's value is at least the
+    # goal's, and one AND with `highBits` tests them all.
+    # ----------------------------------------------------------------------------
+
+    def __init__(self, geometry, goal):
+        cells = geometry.cells
+        goalCells = [i for i in range(len(cells)) if goal >> i & 1]
+        fewest = min(len(n) for n in geometry.neighbours)
+        corners = [i for i, n in enumerate(geometry.neighbours) if len(n) == fewest]
+
+        distances = []
+        for t in goalCells + corners:
+            distances.append(geometry.distance[t])
+        for axis in geometry.axes:
+            values = [axis(x, y) for x, y in cells]
+            for extreme in (min(values), max(values)):
+                distances.append(geometry.distancesFrom(
+                    [i for i, v in enumerate(values) if v == extreme]))
+
+        weights = []
+        for d in distances:
+            K = max(d) + 2
+            w = [fibonacci(K - di) for di in d]
+            if w not in weights:
+                weights.append(w)
+        self.count = len(weights)
+
+        maxValue = max(sum(w) for w in weights)
+        self.width = maxValue.bit_length() + 1
+        self.offset = 0
+        self.highBits = 0
+        for i, w in enumerate(weights):
+            goalValue = sum(w[j] for j in range(len(cells)) if goal >> j & 1)
+            self.offset += ((1 << (self.width - 1)) - goalValue) << (i * self.width)
+            self.highBits |= 1 << ((i + 1) * self.width - 1)
+
+        self.tables = []
+        for k in range(0, len(cells), 8):
+            chunk = []
+            for v in range(256):
+                packed = 0
+                for b in range(8):
+                    if v >> b & 1 and k + b < len(cells):
+                        for i, w in enumerate(weights):
+                            packed += w[k + b] << (i * self.width)
+                chunk.append(packed)
+            self.tables.append(chunk)
+
+        # -----------------------------------------------------------------
+        # near[p][r] is the mask of cells other than p within r steps
+        # -----------------------------------------------------------------
+        self.singleGoal = len(goalCells) == 1
+        self.reach = max(max(d) for d in geometry.distance)
+        self.near = []
+        for p in range(len(cells)):
+            masks = []
+            for r in range(self.reach + 1):
+                mask = 0
+                for i in range(len(cells)):
+                    if i != p and geometry.distance[p][i] <= r:
+                        mask |= 1 << i
+                masks.append(mask)
+            self.near.append(masks)
+
+    def prunes(self, numeric):
+        # -----------------------------------------------------------------
+        # Returns True if the board provably cannot reach the goal: some
+        # pagoda value is below the goal's, or a peg is isolated.
+        # -----------------------------------------------------------------
+        packed = self.offset
+        n = numeric
+        for chunk in self.tables:
+            packed += chunk[n & 255]
+            n >>= 8
+        if packed & self.highBits != self.highBits:
+            return True
+
+        if self.singleGoal:
+            pegCount = bin(numeric).count("1")
+            radius = 2 * (pegCount - 2) + 1
+            if 2 <= pegCount and radius < self.reach:
+                n = numeric
+                while n:
+                    low = n & -n
+                    n ^= low
+                    if not numeric & self.near[low.bit_length() - 1][radius]:
+                        return True
+        return False
+
+
+def pagodaTable(geometry, goal):
+    # -----------------------------------------------------------------
+    # Returns the Pagodas of the board for the numeric goal state,
+    # building them on first use.
+    # -----------------------------------------------------------------
+    key = (geometry, goal)
+    if key not in PAGODA_TABLES:
+        PAGODA_TABLES[key] = Pagodas(geometry, goal)
+    return PAGODA_TABLES[key]
+
+
+# -----------------------------------------------------------------
+# Position classes
+# -----------------------------------------------------------------
+# A jump toggles its three cells, so modulo 2 a board only ever changes
+# by sums of jump masks.  Every colouring that gives each jump an even
+# number of cells of a colour (the classic diagonal colourings mod 3,
+# for orthogonal jumps) is therefore a parity invariant, and start and
+# goal can only be connected if start ^ goal lies in the span of the
+# jump masks over GF(2).  The span is kept as an echelon basis keyed by
+# leading bit, so the test is one reduction of a board-sized integer.
+#
+# With diagonal jumps the span covers every rectangle from 3x4 up, and
+# then only the peg count is left to rule a pair out; the English cross,
+# with orthogonal jumps only, keeps the classic invariants.
+# -----------------------------------------------------------------
+
+POSITION_CLASS_TABLES = {}
+
+
+class PositionClasses:
+
+    def __init__(self, geometry):
+        self.GEOMETRY = geometry
+        self.basis = {}
+        for pegs, hole, rule in jumpTable(geometry):
+            v = self.reduce(pegs | hole)
+            if v:
+                self.basis[v.bit_length() - 1] = v
+        # number of independent parity invariants of the board
+        self.invariants = geometry.size - len(self.basis)
+
+    def reduce(self, numeric):
+        while numeric:
+            lead = self.basis.get(numeric.bit_length() - 1)
+            if lead is None:
+                break
+            numeric ^= lead
+        return numeric
+
+    def separates(self, start, goal):
+        # True if some position class has a different parity in start
+        # and goal, which proves goal unreachable from start.
+        return self.reduce(start ^ goal) != 0
+
+
+def positionClasses(geometry):
+    if geometry not in POSITION_CLASS_TABLES:
+        POSITION_CLASS_TABLES[geometry] = PositionClasses(geometry)
+    return POSITION_CLASS_TABLES[geometry]
+
+
+def provablyUnsolvable(start, goal, geometry):
+    # -----------------------------------------------------------------
+    # Quick check before searching from numeric start to numeric goal:
+    # jumps only remove pegs, and never change the parity invariants.
+    # -----------------------------------------------------------------
+    if bin(goal).count("1") > bin(start).count("1"):
+        return True
+    return positionClasses(geometry).separates(start, goal)
+
+
+# -----------------------------------------------------------------
+# Retrograde solvability tables
+# -----------------------------------------------------------------
+# Starting from the goal, reverse jumps (a peg at newpos jumps back over
+# an empty goner position into an empty jumper position, leaving a peg
+# in both) are applied one layer at a time.  Every board reached this
+# way can be solved, and no other board can.  The result is a bit array
+# with one bit per numeric state: 8 KB for 4x4, 4 MB for 5x5, 1 GB for
+# the English cross, which is more than RETROGRADE_CELL_LIMIT allows.
+# -----------------------------------------------------------------
+
+SOLVABLE_TABLES = {}
+
+# boards with more cells than this are refused: 2^cells bits is already
+# 4 MB, and minutes of search in Python, at 25 cells (5x5), and doubles
+# with every cell after that
+RETROGRADE_CELL_LIMIT = 25
+
+
+def buildSolvableTable(geometry, goal):
+    # -----------------------------------------------------------------
+    # Returns a bytearray in which bit s is set when numeric state s can
+    # reach the numeric goal state.
+    #
+    # A reverse jump needs a peg at newpos and holes at jumper and goner,
+    # so each board only tries the jumps landing on one of its pegs or,
+    # once pegs outnumber holes, the jumps starting from one of its holes.
+    # Raises ValueError for boards of more than RETROGRADE_CELL_LIMIT cells.
+    # -----------------------------------------------------------------
+    cells = geometry.size
+    if cells > RETROGRADE_CELL_LIMIT:
+        raise ValueError("a retrograde table for %d cells would take %s bytes; "
+                         "at most %d cells are supported, try -m meet or -m incremental"
+                         % (cells, format((1 << cells) >> 3, ","), RETROGRADE_CELL_LIMIT))
+    full = (1 << cells) - 1
+    byNewpos = [[(pegs | hole, hole, rule.flipMask) for pegs, hole, rule in jumps]
+                for jumps in cellJumpTables(geometry)[1]]
+    byJumper = [[(pegs | hole, hole, rule.flipMask) for pegs, hole, rule in jumps]
+                for jumps in cellJumpTables(geometry)[0]]
+
+    bits = bytearray(((1 << cells) + 7) >> 3)
+    bits[goal >> 3] |= 1 << (goal & 7)
+    layer = [goal]
+    pegCount = bin(goal).count("1")
+    while layer:
+        nextLayer = []
+        if pegCount * 2 < cells:
+            index, flipCells = byNewpos, 0
+        else:
+            index, flipCells = byJumper, full
+        for s in layer:
+            candidates = flipCells ^ s
+            while candidates:
+                low = candidates & -candidates
+                candidates ^= low
+                for mask, hole, flip in index[low.bit_length() - 1]:
+                    if s & mask == hole:
+                        t = s ^ flip
+                        if not bits[t >> 3] >> (t & 7) & 1:
+                            bits[t >> 3] |= 1 << (t & 7)
+                            nextLayer.append(t)
+        layer = nextLayer
+        pegCount += 1
+    return bits
+
+
+def solvableTable(geometry, goal):
+    # -----------------------------------------------------------------
+    # Returns the solvability bit array for the board and numeric goal,
+    # building it on first use.
+    # -----------------------------------------------------------------
+    key = (geometry, goal)
+    if key not in SOLVABLE_TABLES:
+        SOLVABLE_TABLES[key] = buildSolvableTable(geometry, goal)
+    return SOLVABLE_TABLES[key]
+
+
+def isSolvable(numeric, solvable):
+    # -----------------------------------------------------------------
+    # Looks up numeric state in a solvability bit array.
+    # -----------------------------------------------------------------
+    return solvable[numeric >> 3] >> (numeric & 7) & 1 == 1
+
+
+# -----------------------------------------------------------------
+# Solvability database files
+# -----------------------------------------------------------------
+# A solvability table can be saved to a binary file and mapped back
+# into memory with mmap, so later runs skip the retrograde search and
+# worker processes share one copy through the page cache.  The file is
+# a 32-byte header followed by the bit array:
+#     magic      4s  b"PEGS"
+#     version    H   DB_VERSION
+#     rows, cols B B   bounding box of the geometry
+#     goal       Q   numeric goal state
+#     length     Q   size of the bit array in bytes
+#     checksum   I   zlib.crc32 of the bit array
+#     (4 bytes of padding)
+# -----------------------------------------------------------------
+
+DB_MAGIC = b"PEGS"
+DB_VERSION = 1
+DB_HEADER = struct.Struct("<4sHBBQQI4x")
+
+
+def solvableTableFile(directory, geometry, goal):
+    # -----------------------------------------------------------------
+    # Returns the database file name for a board and numeric goal.
+    # -----------------------------------------------------------------
+    return os.path.join(directory, "solvable_%s_%d.peg" % (geometry.name, goal))
+
+
+def saveSolvableTable(filename, geometry, goal, bits):
+    # -----------------------------------------------------------------
+    # Writes a solvability table to filename.  The file is written under
+    # a temporary name and renamed, so readers never see it half written.
+    # -----------------------------------------------------------------
+    header = DB_HEADER.pack(DB_MAGIC, DB_VERSION, geometry.ROWS, geometry.COLS, goal,
+                            len(bits), zlib.crc32(bits))
+    temp = "%s.%d.tmp" % (filename, os.getpid())
+    with open(temp, "wb") as f:
+        f.write(header)
+        f.write(bits)
+    os.replace(temp, filename)
+
+
+def loadSolvableTable(filename, geometry, goal):
+    # -----------------------------------------------------------------
+    # Maps a solvability table file into memory and returns a read-only
+    # view of its bit array, or None if the file is missing or its header
+    # does not match the board, goal, size and checksum.
+    # -----------------------------------------------------------------
+    try:
+        with open(filename, "rb") as f:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+    length = ((1 << geometry.size) + 7) >> 3
+    if len(data) != DB_HEADER.size + length:
+        data.close()
+        return None
+    header = DB_HEADER.unpack_from(data)
+    bits = memoryview(data)[DB_HEADER.size:]
+    if header[:6] != (DB_MAGIC, DB_VERSION, geometry.ROWS, geometry.COLS, goal, length) \
+            or zlib.crc32(bits) != header[6]:
+        bits.release()
+        data.close()
+        return None
+    return bits
+
+
+def openSolvableTable(directory, geometry, goal):
+    # -----------------------------------------------------------------
+    # Returns the solvability table for the board and numeric goal from
+    # its database file in directory, rebuilding and saving the file if
+    # it is missing or does not match.  directory is created if need be;
+    # if the file cannot be written, the rebuilt table is used from
+    # memory.
+    # -----------------------------------------------------------------
+    key = (geometry, goal)
+    if key not in SOLVABLE_TABLES:
+        filename = solvableTableFile(directory, geometry, goal)
+        bits = loadSolvableTable(filename, geometry, goal)
+        if bits is None:
+            bits = buildSolvableTable(geometry, goal)
+            try:
+                os.makedirs(directory, exist_ok=True)
+                saveSolvableTable(filename, geometry, goal, bits)
+            except OSError as e:
+                print("Cannot save solvability table: %s" % e, file=sys.stderr)
+            else:
+                bits = loadSolvableTable(filename, geometry, goal) or bits
+        SOLVABLE_TABLES[key] = bits
+    return SOLVABLE_TABLES[key]
 
 # --------------------------------------------------------------------------------
 
@@ -87,8 +783,13 @@ class State:
     #     . . X .
     #     X . X X
     #     X X X X
+    # Boards of any size are numbered the same way, row by row from the
+    # bottom right, so cell (x, y) is bit x * BOARD_COLS + y.  Other
+    # geometries number their valid cells in the same order, skipping the
+    # rest.  Python integers have no fixed width, so 8x8 boards and beyond
+    # need no special handling.
     # ----------------------------------------------------------------------------
-    # uses global constants BOARD_ROWS, BOARD_COLS, GOAL_STATE
+    # uses global constants BOARD_GEOMETRY, GOAL_STATE
     # ----------------------------------------------------------------------------
 
     def __init__(self, number):
@@ -96,64 +797,48 @@ class State:
         # Creates a state with the given numeric value.
         # -----------------------------------------------------------------
 
-        self.ROWS = BOARD_ROWS
-        self.COLS = BOARD_COLS
+        self.GEOMETRY = BOARD_GEOMETRY
         self.numeric = number
 
     def __str__(self):
         # -----------------------------------------------------------------
         # returns a string containing the partially filled in grid
-        # corresponding to state.
+        # corresponding to state, highest cell first, with a blank for
+        # each cell of the bounding box outside the board.
         # -----------------------------------------------------------------
-
-        outstr = str(bin(int(self.numeric)))
-        outstr = outstr[2:]
-        if len(outstr) < 16:
-            for i in range(0, 16 - len(outstr)):
-                outstr += ('0')
-
-        return "{} {} {} {}".format(outstr[0:4], outstr[4:8], outstr[8:12], outstr[12:16])
+        g = self.GEOMETRY
+        rows = []
+        for x in reversed(range(g.ROWS)):
+            row = ""
+            for y in reversed(range(g.COLS)):
+                i = g.index.get((x, y))
+                row += " " if i is None else str(self.numeric >> i & 1)
+            rows.append(row)
+        return " ".join(rows)
 
     def applicableRules(self):
-        line = str(bin(self.numeric))[2:]
-        result = [line[i:i+4] for i in range(0, len(line), 4)]
-        final = []
-        test = [[0, 1], [1, 1], [1, 0], [1.-1],
-                [0, -1], [-1, 0], [-1, -1], [-1, 1]]
+        # -----------------------------------------------------------------
+        # Returns the rules whose precondition holds in this state.  Each
+        # candidate jump is tested with two AND operations against the
+        # precomputed jump tables.  A jump starts from a peg and lands in
+        # a hole, so only the jumps from each peg or into each hole,
+        # whichever there are fewer of, are tested.
+        # -----------------------------------------------------------------
+        s = self.numeric
+        cells = self.GEOMETRY.size
+        byJumper, byNewpos = cellJumpTables(self.GEOMETRY)
+        if bin(s).count("1") * 2 <= cells:
+            candidates, index = s, byJumper
+        else:
+            candidates, index = ((1 << cells) - 1) ^ s, byNewpos
+
         rules = []
-        for i in range(0, len(result)):
-            lst = [x for x in result[i]]
-            final.append(lst)
-        # mapper = {
-        #     15 : "0",
-        #     14 : "1",
-        #     13 : "2",
-        #     12 : "3",
-        #     11 : "4",
-        #     10 : "5",
-        #     9 : "6",
-        #     8 : "7",
-        #     7 : "8",
-        #     6 : "9",
-        #     5 : "A",
-        #     4 : "B",
-        #     3 : "C",
-        #     2 : "D",
-        #     1 : "E",
-        #     0 : "F",
-        # }
-
-        for x in range(0, len(final)):
-            for y in range(0, len(final[x])):
-                for dx, dy in [[0, 1], [1, 1], [1, 0], [1, -1], [0, -1], [-1, 0], [-1, -1], [-1, 1]]:
-                    # Checks if the jumps are valid
-                    if (0 <= y + (dy * 2) <= (BOARD_COLS - 1) and 0 <= x + (dx * 2) <= (BOARD_ROWS - 1)):
-                        jumper = (x * BOARD_ROWS) + y
-                        goner = ((x + dx) * BOARD_ROWS) + (y + dy)
-                        newpos = ((x + (dx*2)) * BOARD_ROWS) + (y + (dy*2))
-                        rule = Rule([jumper, goner, newpos])
-                        if rule.precondition(State(self.numeric)):
-                            rules.append(rule)
+        while candidates:
+            low = candidates & -candidates
+            candidates ^= low
+            for pegs, hole, rule in index[low.bit_length() - 1]:
+                if s & pegs == pegs and not s & hole:
+                    rules.append(rule)
         return rules
 
     def goal(self):
@@ -187,6 +872,10 @@ class Rule:
         self.jumper = moveVector[0]
         self.goner = moveVector[1]
         self.newpos = moveVector[2]
+        self.jumperMask = 1 << self.jumper
+        self.gonerMask = 1 << self.goner
+        self.newposMask = 1 << self.newpos
+        self.flipMask = self.jumperMask | self.gonerMask | self.newposMask
 
     def __eq__(self, r):
         return (self.moveVector == r.moveVector)
@@ -196,69 +885,140 @@ class Rule:
         # returns a string describing the rule to be applied
         # -----------------------------------------------------------------
         description = "The peg in slot {} jumps over the peg in slot {} and lands in slot {}.".format(
-            15 - int(self.jumper), 15 - (self.goner), 15 - (self.newpos))
+            self.jumper, self.goner, self.newpos)
 
         return description
 
     def applyRule(self, state):
         # -----------------------------------------------------------------
-        # Returns a new state formed by applying rule to state.
+        # Returns a new state formed by applying rule to state.  The
+        # jumper and goner bits are set and the newpos bit is clear, so a
+        # single XOR moves the peg and removes the one jumped over.
         # -----------------------------------------------------------------
-        # print('numeric', state.numeric)\
-        x = state.numeric + (2 ** (int(self.newpos))) - (2 **
-                                                         (int(self.jumper))) - (2 ** (int(self.goner)))
-        # print("JUMPER {}, GONER {}, newpos {}".format(
-        # (2 ** int(self.jumper)), (2 ** int(self.goner)), (2 ** int(self.newpos))))
-        newState = State(x)
-        return newState
+        return State(state.numeric ^ self.flipMask)
 
     def precondition(self, state):
-        final = str(bin(state.numeric))[2:]
-        final = final.zfill(16)
-        # print('this is final', final)
-        # print(self.jumper,self.goner,final[self.newpos])
-        # result = [line[i:i+4] for i in range(0, len(line), 4)]
-        # final = []
-
-        # for i in range(0, len(result)):
-        #     lst = [x for x in result[i]]
-        #     final.append(lst)
-        if final[self.jumper] == '1' and final[self.goner] == '1' and final[self.newpos] == '0':
-            return True
-        else:
-            return False
+        # -----------------------------------------------------------------
+        # Jumper and goner positions hold pegs, newpos is empty.
+        # -----------------------------------------------------------------
+        pegs = self.jumperMask | self.gonerMask
+        return state.numeric & pegs == pegs and not state.numeric & self.newposMask
 
 
-def flailWildly(state):
-    # print("HERE",state.numeric)
+def flailWildly(state, solvable=None, pagodas=None):
+    # -----------------------------------------------------------------
+    # Applies randomly chosen rules until the goal or a dead end.  If a
+    # solvability table is given, only moves that keep the board solvable
+    # are chosen, so a solvable board always reaches the goal.  If
+    # pagodas (see pagodaTable) is given, moves to boards it prunes are
+    # never chosen.
+    # -----------------------------------------------------------------
     newstate = copy.deepcopy(state)
     while (not newstate.goal()):
         L = newstate.applicableRules()
-        print
+        if solvable:
+            L = [r for r in L if isSolvable(newstate.numeric ^ r.flipMask, solvable)]
+        if pagodas:
+            L = [r for r in L if not pagodas.prunes(newstate.numeric ^ r.flipMask)]
         if not L:
             return "Dead End"
-        rule = Rule(random.choice(L))
+        rule = random.choice(L)
         print(rule)
         newstate = rule.applyRule(newstate)
 
     return 'SUCCESS'
 
 
+def bulkPlayouts(state, games, batch=50000, rng=None):
+    # -----------------------------------------------------------------
+    # Plays `games` random games from state, like flailWildly, but with
+    # NumPy: up to `batch` games advance in lock-step, held as a uint64
+    # array and tested against every entry of the jump table at once.
+    # Needs NumPy and a board of at most 64 cells.
+    #
+    # Returns a dict with the number of games, the number that reached
+    # GOAL_STATE, the success rate, and histograms of the final number of
+    # pegs and of the number of moves made before getting stuck.
+    # -----------------------------------------------------------------
+    if np is None:
+        raise RuntimeError("bulkPlayouts needs NumPy")
+    if state.GEOMETRY.size > 64:
+        raise ValueError("bulkPlayouts handles boards of at most 64 cells")
+    if rng is None:
+        rng = np.random.default_rng()
+
+    table = jumpTable(state.GEOMETRY)
+    pegs = np.array([entry[0] for entry in table], dtype=np.uint64)
+    hole = np.array([entry[1] for entry in table], dtype=np.uint64)
+    flip = pegs | hole
+    goal = np.uint64(GOAL_STATE.numeric)
+
+    successes = 0
+    pegCounts = {}
+    deadEndDepths = {}
+    played = 0
+    while played < games:
+        n = min(batch, games - played)
+        boards = np.full(n, state.numeric, dtype=np.uint64)
+        depth = np.zeros(n, dtype=np.int64)
+        active = np.arange(n)
+        while active.size:
+            current = boards[active]
+            legal = ((current[:, None] & pegs) == pegs) & ((current[:, None] & hole) == 0)
+            counts = legal.sum(axis=1)
+            moving = (counts > 0) & (current != goal)
+            active = active[moving]
+            if not active.size:
+                break
+            legal = legal[moving]
+            # pick the k-th legal move of each game, k uniform in [0, count)
+            k = (rng.random(active.size) * counts[moving]).astype(np.int64)
+            choice = (legal.cumsum(axis=1) > k[:, None]).argmax(axis=1)
+            boards[active] ^= flip[choice]
+            depth[active] += 1
+
+        finalPegs = np.unpackbits(boards.view(np.uint8)).reshape(n, 64).sum(axis=1)
+        solved = boards == goal
+        successes += int(solved.sum())
+        for value, count in zip(*np.unique(finalPegs, return_counts=True)):
+            pegCounts[int(value)] = pegCounts.get(int(value), 0) + int(count)
+        for value, count in zip(*np.unique(depth[~solved], return_counts=True)):
+            deadEndDepths[int(value)] = deadEndDepths.get(int(value), 0) + int(count)
+        played += n
+
+    return {"games": games, "successes": successes,
+            "successRate": successes / games if games else 0.0,
+            "finalPegs": dict(sorted(pegCounts.items())),
+            "deadEndDepth": dict(sorted(deadEndDepths.items()))}
+
+
 path = []
 
 
-def backTrack(stateList, verbose):
+def backTrack(stateList, trace, solvable=None, pagodas=None):
+    # -----------------------------------------------------------------
+    # If trace (a searchtrace.Trace) is given, each move tried is recorded
+    # in it with its result.  If a solvability table is given, an unsolvable board fails at once
+    # and only moves that keep the board solvable are tried.  If pagodas
+    # (see pagodaTable) is given, boards it prunes fail at once.
+    # -----------------------------------------------------------------
     first = stateList[0]
     global path
-    maxrecurse = 16
+    maxrecurse = first.GEOMETRY.size
     if first in stateList[1:]:
         return 'FAILED - 1'
     if first.goal():
         return "GOALLLLL"
+    if solvable and not isSolvable(first.numeric, solvable):
+        return "FAILED - 6 : Unsolvable"
+    if pagodas and pagodas.prunes(first.numeric):
+        return "FAILED - 7 : Pagoda cut"
     if maxrecurse < len(stateList):
         return "FAILED - 2 : Max Depth Exceded"
 
     rules = first.applicableRules()
+    if solvable:
+        rules = [r for r in rules if isSolvable(first.numeric ^ r.flipMask, solvable)]
 
     if not rules:
         return "FAILED - 3 : No applicable rules"
@@ -267,17 +1027,1106 @@ def backTrack(stateList, verbose):
         newState = r.applyRule(first)
         newStatelist = copy.deepcopy(stateList)
         newStatelist.insert(0, newState)
-        X = backTrack(newStatelist, verbose)
-        if verbose:
-            print(r)
-            print(X)
-            print(newState)
+        X = backTrack(newStatelist, trace, solvable, pagodas)
+        if trace:
+            trace.record(len(stateList), r, X if isinstance(X, str) else "SOLVED", newState)
         if 'FAILED' not in X:
             path.append([r, newState])
             return path
     return "FAILED - 4"
 
 
+class SearchStats:
+
+    # ----------------------------------------------------------------------------
+    # SearchStats:
+    # ----------------------------------------------------------------------------
+    # Counters kept by a search engine: the number of nodes (states)
+    # generated, the deepest move count reached and the number of
+    # subtrees cut off by pagoda or isolated-peg pruning.
+    # ----------------------------------------------------------------------------
+
+    def __init__(self):
+        self.nodes = 0
+        self.maxDepth = 0
+        self.cuts = 0
+
+    def __str__(self):
+        return "Nodes: %d, Max depth: %d, Pagoda cuts: %d" % (
+            self.nodes, self.maxDepth, self.cuts)
+
+
+def examineState(first, depth, onPath, solvable, pagodas=None):
+    # -----------------------------------------------------------------
+    # Performs backTrack's tests on a state reached after depth moves.
+    # Returns (X, rules), where X is "GOALLLLL" or a FAILED message if the
+    # state is not to be expanded, and None otherwise.
+    # -----------------------------------------------------------------
+    if first.numeric in onPath:
+        return 'FAILED - 1', None
+    if first.goal():
+        return "GOALLLLL", None
+    if solvable and not isSolvable(first.numeric, solvable):
+        return "FAILED - 6 : Unsolvable", None
+    if pagodas and pagodas.prunes(first.numeric):
+        return "FAILED - 7 : Pagoda cut", None
+    if first.GEOMETRY.size < depth + 1:
+        return "FAILED - 2 : Max Depth Exceded", None
+
+    rules = first.applicableRules()
+    if solvable:
+        rules = [r for r in rules if isSolvable(first.numeric ^ r.flipMask, solvable)]
+
+    if not rules:
+        return "FAILED - 3 : No applicable rules", None
+    return None, rules
+
+
+def iterativeBackTrack(state, trace, solvable=None, stats=None, pagodas=None):
+    # -----------------------------------------------------------------
+    # Non-recursive version of backTrack, driven by an explicit stack of
+    # [rule, State, iterator over remaining rules] entries.  It tries the
+    # rules in the same order and fails with the same messages, but
+    # returns the moves from state to the goal in order, and keeps no
+    # global state, so it can run any number of times in one process.
+    # If stats (a SearchStats) is given, it counts nodes, depth and
+    # pagoda cuts.
+    # -----------------------------------------------------------------
+    if stats is None:
+        stats = SearchStats()
+    stats.nodes += 1
+    X, rules = examineState(state, 0, set(), solvable, pagodas)
+    if X is not None:
+        return X
+
+    stack = [[None, state, iter(rules)]]
+    onPath = {state.numeric}
+    while stack:
+        entry = stack[-1]
+        r = next(entry[2], None)
+        if r is None:
+            stack.pop()
+            onPath.discard(entry[1].numeric)
+            if trace and stack:
+                trace.record(len(stack), entry[0], "FAILED - 4", entry[1])
+            continue
+
+        newState = r.applyRule(entry[1])
+        stats.nodes += 1
+        stats.maxDepth = max(stats.maxDepth, len(stack))
+        X, rules = examineState(newState, len(stack), onPath, solvable, pagodas)
+        if X == "GOALLLLL":
+            return [[e[0], e[1]] for e in stack[1:]] + [[r, newState]]
+        if X is not None:
+            if X == "FAILED - 7 : Pagoda cut":
+                stats.cuts += 1
+            if trace:
+                trace.record(len(stack), r, X, newState)
+            continue
+        stack.append([r, newState, iter(rules)])
+        onPath.add(newState.numeric)
+    return "FAILED - 4"
+
+
+def backTrackMemo(stack, deadStates, trace, symmetries=None, stats=None,
+                  pagodas=None):
+    # -----------------------------------------------------------------
+    # Backtracking over a single shared path stack.  stack is a list of
+    # [rule, State] entries, with [None, initialState] at the bottom; a
+    # move is pushed before recursing and popped when it fails, so no
+    # list is ever copied.  deadStates is a set of numeric states already
+    # proven unsolvable, so a board reached again by a different move
+    # order is pruned at once.
+    #
+    # If symmetries (see symmetryGroup) is given, deadStates holds only
+    # canonical forms, so every mirror image of a dead board is pruned as
+    # well and the table shrinks by up to the size of the group.  The path
+    # stack itself always stays in the orientation of the initial state,
+    # so the moves returned need no translation.
+    #
+    # Every jump removes a peg, so a state can never repeat along a path
+    # and no cycle check or depth limit is needed.
+    #
+    # On success, returns the list of [rule, State] moves from the
+    # initial state to the goal.  If stats (a SearchStats) is given, it
+    # counts nodes, depth and pagoda cuts.  If pagodas (see pagodaTable)
+    # is given, boards it prunes fail at once.
+    # -----------------------------------------------------------------
+    first = stack[-1][1]
+    if stats:
+        stats.nodes += 1
+        stats.maxDepth = max(stats.maxDepth, len(stack) - 1)
+    key = first.numeric
+    if symmetries:
+        key = symmetries.canonical(key)
+    if key in deadStates:
+        return "FAILED - 5 : Known dead state"
+    if first.goal():
+        return stack[1:]
+    if pagodas and pagodas.prunes(first.numeric):
+        if stats:
+            stats.cuts += 1
+        deadStates.add(key)
+        return "FAILED - 7 : Pagoda cut"
+
+    rules = first.applicableRules()
+
+    if not rules:
+        deadStates.add(key)
+        return "FAILED - 3 : No applicable rules"
+
+    depth = len(stack)
+    for r in rules:
+        newState = r.applyRule(first)
+        stack.append([r, newState])
+        X = backTrackMemo(stack, deadStates, trace, symmetries, stats, pagodas)
+        if trace:
+            trace.record(depth, r, X if isinstance(X, str) else "SOLVED", newState)
+        if 'FAILED' not in X:
+            return X
+        stack.pop()
+    deadStates.add(key)
+    return "FAILED - 4"
+
+
+# -----------------------------------------------------------------
+# Incrementally maintained boards
+# -----------------------------------------------------------------
+
+AFFECTED_TABLES = {}
+
+
+def affectedJumps(geometry):
+    # -----------------------------------------------------------------
+    # Returns, for each index j into jumpTable(geometry), the list of
+    # (k, pegs, hole) for every jump k that uses one of jump j's three
+    # cells; only these can change legality when jump j is made.
+    # -----------------------------------------------------------------
+    if geometry not in AFFECTED_TABLES:
+        table = jumpTable(geometry)
+        byCell = [[] for i in range(geometry.size)]
+        for k, (pegs, hole, rule) in enumerate(table):
+            for cell in rule.moveVector:
+                byCell[cell].append(k)
+        affected = []
+        for pegs, hole, rule in table:
+            ks = sorted(set(byCell[rule.jumper] + byCell[rule.goner] + byCell[rule.newpos]))
+            affected.append([(k, table[k][0], table[k][1]) for k in ks])
+        AFFECTED_TABLES[geometry] = affected
+    return AFFECTED_TABLES[geometry]
+
+
+class Board:
+
+    # ----------------------------------------------------------------------------
+    # Board:
+    # ----------------------------------------------------------------------------
+    # A mutable numeric state together with the set of indices (into
+    # jumpTable) of the jumps that are legal in it.  apply and undo make or
+    # take back a jump in place and re-test only the jumps that share a
+    # cell with it, so the cost of a move does not depend on the board size.
+    # ----------------------------------------------------------------------------
+
+    def __init__(self, geometry, numeric):
+        self.table = jumpTable(geometry)
+        self.affected = affectedJumps(geometry)
+        self.numeric = numeric
+        self.legal = {j for j, (pegs, hole, rule) in enumerate(self.table)
+                      if numeric & pegs == pegs and not numeric & hole}
+
+    def apply(self, j):
+        self.numeric ^= self.table[j][2].flipMask
+        self.update(j)
+
+    def undo(self, j):
+        # -----------------------------------------------------------------
+        # A jump flips its three cells, so undoing it is the same XOR.
+        # -----------------------------------------------------------------
+        self.numeric ^= self.table[j][2].flipMask
+        self.update(j)
+
+    def update(self, j):
+        s = self.numeric
+        legal = self.legal
+        for k, pegs, hole in self.affected[j]:
+            if s & pegs == pegs and not s & hole:
+                legal.add(k)
+            else:
+                legal.discard(k)
+
+
+def incrementalBackTrack(state, trace, deadStates=None, stats=None, symmetries=None):
+    # -----------------------------------------------------------------
+    # Backtracking over a single Board that is updated in place: each
+    # level of the explicit stack holds the jumps still to try there, and
+    # a failed jump is undone rather than copied away.  deadStates (a set
+    # of numeric states proven unsolvable) prunes transpositions, as in
+    # backTrackMemo, and holds canonical forms if symmetries is given.
+    #
+    # Returns the list of [rule, State] moves from state to the goal.  If
+    # stats (a SearchStats) is given, it counts nodes and depth.
+    # -----------------------------------------------------------------
+    if deadStates is None:
+        deadStates = set()
+    if stats is None:
+        stats = SearchStats()
+    board = Board(state.GEOMETRY, state.numeric)
+    goal = GOAL_STATE.numeric
+    stats.nodes += 1
+    if board.numeric == goal:
+        return []
+
+    def key(numeric):
+        return symmetries.canonical(numeric) if symmetries else numeric
+
+    moves = []
+    stack = [sorted(board.legal)]
+    while stack:
+        remaining = stack[-1]
+        if not remaining:
+            stack.pop()
+            deadStates.add(key(board.numeric))
+            if moves:
+                board.undo(moves.pop())
+            continue
+
+        j = remaining.pop()
+        board.apply(j)
+        stats.nodes += 1
+        stats.maxDepth = max(stats.maxDepth, len(moves) + 1)
+        if trace:
+            trace.record(len(moves) + 1, board.table[j][2], board.numeric)
+        if board.numeric == goal:
+            moves.append(j)
+            path = []
+            s = state
+            for j in moves:
+                s = board.table[j][2].applyRule(s)
+                path.append([board.table[j][2], s])
+            return path
+        if key(board.numeric) in deadStates:
+            board.undo(j)
+            continue
+        moves.append(j)
+        stack.append(sorted(board.legal))
+    return "FAILED - 4"
+
+
+# -----------------------------------------------------------------
+# Bidirectional search
+# -----------------------------------------------------------------
+# Every jump removes one peg, so any solution from state takes exactly
+# pegs(state) - pegs(goal) moves.  Layers are grown forward from the
+# initial state and backward (by reverse jumps) from the goal, always on
+# the smaller side, until together they span that many moves; the
+# solutions pass through the boards in both final layers.  Layers are
+# sorted uint64 arrays expanded as in layeredBFS (see below), 8 bytes a
+# board, so only the boards within half a solution of either end are
+# ever stored.
+#
+# That is not always less than a retrograde table (see solvableTable),
+# which takes one bit for every possible board: on 5x5 the layers hold
+# 16.5 million boards (132 MB) against a 4 MB table.  The layers win
+# on boards too large for such a table, 6x6 and up (8 GB), where the
+# boards near either end are a tiny fraction of all 2^cells.
+# -----------------------------------------------------------------
+
+
+def reverseRules(numeric, geometry):
+    # -----------------------------------------------------------------
+    # Returns the rules that could have produced numeric state: a peg at
+    # newpos, holes at jumper and goner.
+    # -----------------------------------------------------------------
+    byNewpos = cellJumpTables(geometry)[1]
+    rules = []
+    candidates = numeric
+    while candidates:
+        low = candidates & -candidates
+        candidates ^= low
+        for pegs, hole, rule in byNewpos[low.bit_length() - 1]:
+            if not numeric & pegs:
+                rules.append(rule)
+    return rules
+
+
+def bidirectional(state, stats=None, chunk=1 << 18):
+    # -----------------------------------------------------------------
+    # Meet-in-the-middle search from state to GOAL_STATE.  Each layer is
+    # a sorted array of numeric states; no parent pointers are kept, as
+    # the path is rebuilt from the stored layers once they meet.  Needs
+    # NumPy and at most 64 cells.
+    #
+    # Returns the list of [rule, State] moves, or "FAILED - 4".  If stats
+    # (a SearchStats) is given, it counts the boards in all layers.
+    # -----------------------------------------------------------------
+    if np is None:
+        raise RuntimeError("bidirectional needs NumPy")
+    if state.GEOMETRY.size > 64:
+        raise ValueError("bidirectional handles boards of at most 64 cells")
+    if stats is None:
+        stats = SearchStats()
+    geometry = state.GEOMETRY
+    goal = GOAL_STATE.numeric
+    depth = bin(state.numeric).count("1") - bin(goal).count("1")
+    if depth < 0:
+        return "FAILED - 4"
+
+    pegs, hole, flip = layerMasks(geometry)
+    forward = [np.array([state.numeric], dtype=np.uint64)]
+    backward = [np.array([goal], dtype=np.uint64)]
+    stats.nodes += 2
+    while len(forward) + len(backward) - 2 < depth:
+        if forward[-1].size <= backward[-1].size:
+            layer = expandLayer(forward[-1], pegs, hole, flip, chunk)
+            forward.append(layer)
+        else:
+            # a reverse jump needs a peg at newpos and holes at jumper
+            # and goner
+            layer = expandLayer(backward[-1], hole, pegs, flip, chunk)
+            backward.append(layer)
+        stats.nodes += int(layer.size)
+        stats.maxDepth = max(len(forward), len(backward)) - 1
+        if not layer.size:
+            return "FAILED - 4"
+
+    meeting = np.intersect1d(forward[-1], backward[-1], assume_unique=True)
+    if not meeting.size:
+        return "FAILED - 4"
+
+    # -----------------------------------------------------------------
+    # Walk from a meeting board back to state through the forward
+    # layers, then on to the goal through the backward layers.
+    # -----------------------------------------------------------------
+    middle = int(meeting[0])
+    rules = []
+    numeric = middle
+    for layer in reversed(forward[:-1]):
+        for r in reverseRules(numeric, geometry):
+            if inLayer(numeric ^ r.flipMask, layer):
+                rules.insert(0, r)
+                numeric ^= r.flipMask
+                break
+    numeric = middle
+    for layer in reversed(backward[:-1]):
+        for r in State(numeric).applicableRules():
+            if inLayer(numeric ^ r.flipMask, layer):
+                rules.append(r)
+                numeric ^= r.flipMask
+                break
+
+    path = []
+    s = state
+    for r in rules:
+        s = r.applyRule(s)
+        path.append([r, s])
+    return path
+
+
+# -----------------------------------------------------------------
+# Layered breadth-first search with NumPy
+# -----------------------------------------------------------------
+# A board with k pegs can only be reached after exactly pegs(start) - k
+# moves, so breadth-first layers never overlap and each one can be kept
+# as a sorted uint64 array: children are generated for every jump at
+# once with mask operations, and duplicates removed with np.unique.
+# -----------------------------------------------------------------
+
+
+def layerMasks(geometry):
+    # -----------------------------------------------------------------
+    # Returns the (pegs, hole, flip) uint64 masks of every jump on the
+    # board: jumper and goner, newpos, and all three.
+    # -----------------------------------------------------------------
+    table = jumpTable(geometry)
+    pegs = [np.uint64(entry[0]) for entry in table]
+    hole = [np.uint64(entry[1]) for entry in table]
+    flip = [np.uint64(entry[0] | entry[1]) for entry in table]
+    return pegs, hole, flip
+
+
+def expandLayer(frontier, present, absent, flip, chunk=1 << 20):
+    # -----------------------------------------------------------------
+    # Returns the sorted array of boards one move from the sorted array
+    # frontier: for each move, the boards with every bit of present[i]
+    # set and every bit of absent[i] clear, with flip[i] toggled.
+    # Forward jumps pass (pegs, hole), reverse jumps (hole, pegs).
+    # frontier is expanded `chunk` boards at a time to bound the size of
+    # the temporary arrays, and the children of the chunks are merged
+    # whenever they outgrow the boards merged so far, as the same board
+    # is usually reached from many chunks.
+    # -----------------------------------------------------------------
+    zero = np.uint64(0)
+    merged = np.zeros(0, dtype=np.uint64)
+    parts = []
+    pending = 0
+    for start in range(0, frontier.size, chunk):
+        boards = frontier[start:start + chunk]
+        children = []
+        for p, a, f in zip(present, absent, flip):
+            legal = ((boards & p) == p) & ((boards & a) == zero)
+            if legal.any():
+                children.append(boards[legal] ^ f)
+        if children:
+            part = np.unique(np.concatenate(children))
+            parts.append(part)
+            pending += part.size
+        if pending > 2 * max(merged.size, chunk):
+            merged = np.unique(np.concatenate([merged] + parts))
+            parts = []
+            pending = 0
+    if parts:
+        merged = np.unique(np.concatenate([merged] + parts))
+    return merged
+
+
+def inLayer(numeric, layer):
+    # -----------------------------------------------------------------
+    # True if numeric state is in the sorted array layer.
+    # -----------------------------------------------------------------
+    i = int(np.searchsorted(layer, np.uint64(numeric)))
+    return i < layer.size and int(layer[i]) == numeric
+
+
+def layeredBFS(state, stats=None, chunk=1 << 20):
+    # -----------------------------------------------------------------
+    # Expands every board reachable from state.  Returns the list of
+    # layers, layer i being the sorted array of boards reached after i
+    # moves.  A layer is expanded `chunk` boards at a time to bound the
+    # size of the temporary arrays.  Needs NumPy and at most 64 cells.
+    # -----------------------------------------------------------------
+    if np is None:
+        raise RuntimeError("layeredBFS needs NumPy")
+    if state.GEOMETRY.size > 64:
+        raise ValueError("layeredBFS handles boards of at most 64 cells")
+    if stats is None:
+        stats = SearchStats()
+
+    pegs, hole, flip = layerMasks(state.GEOMETRY)
+
+    layers = [np.array([state.numeric], dtype=np.uint64)]
+    stats.nodes += 1
+    while True:
+        layer = expandLayer(layers[-1], pegs, hole, flip, chunk)
+        if not layer.size:
+            break
+        layers.append(layer)
+        stats.nodes += int(layer.size)
+        stats.maxDepth = len(layers) - 1
+    return layers
+
+
+def layeredPath(state, layers):
+    # -----------------------------------------------------------------
+    # Rebuilds a path from state to GOAL_STATE out of the layers returned
+    # by layeredBFS, stepping back from the goal by reverse jumps into
+    # the previous layer.  Returns the [rule, State] moves or "FAILED - 4".
+    # -----------------------------------------------------------------
+    goal = GOAL_STATE.numeric
+    depth = bin(state.numeric).count("1") - bin(goal).count("1")
+
+    if depth < 0 or depth >= len(layers) or not inLayer(goal, layers[depth]):
+        return "FAILED - 4"
+
+    rules = []
+    numeric = goal
+    for layer in reversed(layers[:depth]):
+        for r in reverseRules(numeric, state.GEOMETRY):
+            if inLayer(numeric ^ r.flipMask, layer):
+                rules.insert(0, r)
+                numeric ^= r.flipMask
+                break
+
+    path = []
+    s = state
+    for r in rules:
+        s = r.applyRule(s)
+        path.append([r, s])
+    return path
+
+
+# -----------------------------------------------------------------
+# State-graph files
+# -----------------------------------------------------------------
+# The reachable graph from an initial board, for offline analysis.  The
+# file is a 64-byte header followed by three little-endian arrays that
+# load directly with np.memmap (see loadStateGraph):
+#     magic      4s   b"PEGG"
+#     version    H    GRAPH_VERSION
+#     cells      H    number of cells of the geometry
+#     geometry   16s  geometry name, e.g. b"5x5" or b"english"
+#     nodes      Q    number of boards n
+#     edges      Q    number of jumps m
+#     start      Q    numeric initial state
+#     goal       Q    numeric goal state
+#     (8 bytes of padding)
+#     nodes      uint64[n]      the boards, sorted
+#     offsets    uint64[n + 1]  jumps from nodes[i] are targets[offsets[i]:
+#                               offsets[i + 1]]
+#     targets    uint32[m]      index into nodes of the board each jump
+#                               leads to, sorted within each board
+# The jump itself is nodes[i] ^ nodes[targets[k]].
+# -----------------------------------------------------------------
+
+GRAPH_MAGIC = b"PEGG"
+GRAPH_VERSION = 1
+GRAPH_HEADER = struct.Struct("<4sHH16sQQQQ8x")
+
+
+def exportStateGraph(state, filename, chunk=1 << 20):
+    # -----------------------------------------------------------------
+    # Writes the graph of boards reachable from state to filename, and
+    # returns (nodes, edges).  The boards are found with layeredBFS; the
+    # jumps are then generated `chunk` boards at a time and streamed to
+    # the file, the offsets being filled in once all are counted.
+    # -----------------------------------------------------------------
+    geometry = state.GEOMETRY
+    nodes = np.sort(np.concatenate(layeredBFS(state)))
+    if nodes.size >= 1 << 32:
+        raise ValueError("exportStateGraph handles fewer than 2**32 boards")
+
+    pegs, hole, flip = layerMasks(geometry)
+    zero = np.uint64(0)
+
+    offsets = np.zeros(nodes.size + 1, dtype=np.uint64)
+    temp = "%s.%d.tmp" % (filename, os.getpid())
+    with open(temp, "wb") as f:
+        f.write(bytes(GRAPH_HEADER.size))
+        f.write(nodes.astype("<u8").tobytes())
+        f.seek(offsets.nbytes, os.SEEK_CUR)
+        edges = 0
+        for start in range(0, nodes.size, chunk):
+            boards = nodes[start:start + chunk]
+            sources = []
+            targets = []
+            for p, h, fl in zip(pegs, hole, flip):
+                legal = np.flatnonzero(((boards & p) == p) & ((boards & h) == zero))
+                if legal.size:
+                    sources.append(legal)
+                    targets.append(np.searchsorted(nodes, boards[legal] ^ fl))
+            if not sources:
+                continue
+            sources = np.concatenate(sources)
+            targets = np.concatenate(targets)
+            order = np.lexsort((targets, sources))
+            f.write(targets[order].astype("<u4").tobytes())
+            offsets[start + 1:start + 1 + boards.size] = \
+                np.bincount(sources, minlength=boards.size)
+            edges += int(sources.size)
+        np.cumsum(offsets, out=offsets)
+
+        f.seek(GRAPH_HEADER.size + nodes.nbytes)
+        f.write(offsets.astype("<u8").tobytes())
+        f.seek(0)
+        f.write(GRAPH_HEADER.pack(GRAPH_MAGIC, GRAPH_VERSION, geometry.size,
+                                  geometry.name.encode(), nodes.size, edges,
+                                  state.numeric, GOAL_STATE.numeric))
+    os.replace(temp, filename)
+    return int(nodes.size), edges
+
+
+def loadStateGraph(filename):
+    # -----------------------------------------------------------------
+    # Maps a state-graph file with np.memmap.  Returns (header, nodes,
+    # offsets, targets), header being a dict of the header fields.
+    # -----------------------------------------------------------------
+    with open(filename, "rb") as f:
+        fields = GRAPH_HEADER.unpack(f.read(GRAPH_HEADER.size))
+    if fields[0] != GRAPH_MAGIC or fields[1] != GRAPH_VERSION:
+        raise ValueError("%s is not a state-graph file" % filename)
+    header = {"cells": fields[2], "geometry": fields[3].rstrip(b"\0").decode(),
+              "nodes": fields[4], "edges": fields[5],
+              "start": fields[6], "goal": fields[7]}
+    n, m = header["nodes"], header["edges"]
+    position = GRAPH_HEADER.size
+    nodes = np.memmap(filename, dtype="<u8", mode="r", offset=position, shape=(n,))
+    position += 8 * n
+    offsets = np.memmap(filename, dtype="<u8", mode="r", offset=position, shape=(n + 1,))
+    position += 8 * (n + 1)
+    targets = np.memmap(filename, dtype="<u4", mode="r", offset=position, shape=(m,)) \
+        if m else np.zeros(0, dtype="<u4")
+    return header, nodes, offsets, targets
+
+
+# -----------------------------------------------------------------
+# Counting and enumerating solutions
+# -----------------------------------------------------------------
+
+
+def countSolutions(state, counts=None):
+    # -----------------------------------------------------------------
+    # Returns the number of distinct move sequences leading from state to
+    # the goal.  counts is a dict from numeric state to its number of
+    # solutions; each board is counted once however many move orders
+    # reach it, and the dict can be reused for later calls with the same
+    # board size and goal.
+    # -----------------------------------------------------------------
+    if counts is None:
+        counts = {}
+    numeric = state.numeric
+    if numeric in counts:
+        return counts[numeric]
+    if state.goal():
+        counts[numeric] = 1
+        return 1
+    total = 0
+    for r in state.applicableRules():
+        total += countSolutions(r.applyRule(state), counts)
+    counts[numeric] = total
+    return total
+
+
+def enumerateSolutions(state, counts=None):
+    # -----------------------------------------------------------------
+    # Generates every solution from state, one at a time, as a list of
+    # [rule, State] moves.  Moves into boards with no solutions (found
+    # with countSolutions, sharing counts) are never tried, so no work is
+    # wasted on dead ends.
+    # -----------------------------------------------------------------
+    if counts is None:
+        counts = {}
+    if countSolutions(state, counts) == 0:
+        return
+    stack = [[None, state, iter(state.applicableRules())]]
+    while stack:
+        entry = stack[-1]
+        if entry[1].goal():
+            yield [[e[0], e[1]] for e in stack[1:]]
+            stack.pop()
+            continue
+        r = next(entry[2], None)
+        if r is None:
+            stack.pop()
+            continue
+        newState = r.applyRule(entry[1])
+        if counts[newState.numeric]:
+            stack.append([r, newState, iter(newState.applicableRules())])
+
+
+def solutionLine(solution):
+    # -----------------------------------------------------------------
+    # Returns a solution as one line of jumper-goner-newpos moves.
+    # -----------------------------------------------------------------
+    return " ".join("%d-%d-%d" % tuple(r.moveVector) for r, st in solution)
+
+
+# -----------------------------------------------------------------
+# Best-first search
+# -----------------------------------------------------------------
+# Heuristics take a numeric state and return a number; smaller values
+# are expanded first.  They are built per board and goal by
+# heuristicFunction:
+#   "pegs"     : number of pegs left above the goal's
+#   "spread"   : total king-move distance of the pegs from the nearest
+#                goal peg
+#   "mobility" : minus the number of jumps available
+# -----------------------------------------------------------------
+
+HEURISTICS = ["pegs", "spread", "mobility"]
+
+
+def heuristicFunction(name, geometry, goal):
+    # -----------------------------------------------------------------
+    # Returns the heuristic called name for the board and numeric goal.
+    # -----------------------------------------------------------------
+    if name == "pegs":
+        goalPegs = bin(goal).count("1")
+        return lambda numeric: bin(numeric).count("1") - goalPegs
+
+    if name == "spread":
+        goalCells = [i for i in range(geometry.size) if goal >> i & 1]
+        distance = geometry.distancesFrom(goalCells)
+
+        def spread(numeric):
+            total = 0
+            while numeric:
+                low = numeric & -numeric
+                numeric ^= low
+                total += distance[low.bit_length() - 1]
+            return total
+        return spread
+
+    if name == "mobility":
+        board = State(0)
+        board.GEOMETRY = geometry
+
+        def mobility(numeric):
+            board.numeric = numeric
+            return -len(board.applicableRules())
+        return mobility
+
+    raise ValueError("Unknown heuristic: %s" % name)
+
+
+def bestFirst(state, heuristic, trace, stats=None, pagodas=None):
+    # -----------------------------------------------------------------
+    # Greedy best-first search from state, keeping the open boards in a
+    # binary heap ordered by heuristic (a function of the numeric state),
+    # with ties going to the board with fewer pegs.  Every board
+    # generated is recorded with its parent and rule in a dict keyed by
+    # numeric state, which also serves as the closed set.
+    #
+    # Returns the list of [rule, State] moves from state to the goal, or
+    # "FAILED - 4" when every reachable board has been expanded.  If stats
+    # (a SearchStats) is given, it counts nodes, depth and pagoda cuts.
+    # -----------------------------------------------------------------
+    if stats is None:
+        stats = SearchStats()
+    parents = {state.numeric: None}
+    counter = 0
+    open = [(heuristic(state.numeric), bin(state.numeric).count("1"), counter,
+             state.numeric, 0)]
+    stats.nodes += 1
+    while open:
+        h, pegs, order, numeric, depth = heapq.heappop(open)
+        first = State(numeric)
+        if trace:
+            trace.record(depth, "Expanding (h=%s)" % h, first)
+        if first.goal():
+            path = []
+            while parents[numeric] is not None:
+                parent, rule = parents[numeric]
+                path.insert(0, [rule, State(numeric)])
+                numeric = parent
+            return path
+
+        for r in first.applicableRules():
+            child = numeric ^ r.flipMask
+            if child in parents:
+                continue
+            parents[child] = (numeric, r)
+            stats.nodes += 1
+            stats.maxDepth = max(stats.maxDepth, depth + 1)
+            if pagodas and pagodas.prunes(child):
+                stats.cuts += 1
+                continue
+            counter += 1
+            heapq.heappush(open, (heuristic(child), pegs - 1, counter, child, depth + 1))
+    return "FAILED - 4"
+
+
+# -----------------------------------------------------------------
+# Parallel backtracking
+# -----------------------------------------------------------------
+# The tree is expanded breadth-first from the initial state until there
+# are several subtrees per process; each subtree is then searched in a
+# multiprocessing pool.  Every worker keeps its own table of dead states
+# (WORKER_DEAD_STATES, keyed by canonical form with WORKER_SYMMETRIES)
+# and of solution counts (WORKER_COUNTS), shared by all the subtrees it
+# searches.
+# -----------------------------------------------------------------
+
+WORKER_DEAD_STATES = None
+WORKER_COUNTS = None
+WORKER_SYMMETRIES = None
+
+# solutions are written to standard output in chunks below PIPE_BUF, so
+# that lines from different workers are not mixed
+WRITE_CHUNK = 4000
+
+
+def initWorker(geometry, goal, symmetry=False):
+    # -----------------------------------------------------------------
+    # Sets the board globals and the tables of a worker process, with
+    # the symmetries fixing the goal if symmetry is set.
+    # -----------------------------------------------------------------
+    global BOARD_GEOMETRY, GOAL_STATE, WORKER_DEAD_STATES, WORKER_COUNTS, WORKER_SYMMETRIES
+    BOARD_GEOMETRY = geometry
+    GOAL_STATE = State(goal)
+    WORKER_DEAD_STATES = set()
+    WORKER_COUNTS = {}
+    WORKER_SYMMETRIES = symmetryGroup(geometry, goal) if symmetry else None
+
+
+def solveSubtree(task):
+    # -----------------------------------------------------------------
+    # Searches one subtree given as (prefix, numeric, findAll), where
+    # prefix is the list of moves leading to it.  Returns the full path
+    # to a solution or None, or with findAll, the number of solutions,
+    # writing each of them to standard output as it is found (see
+    # solutionLine).
+    # -----------------------------------------------------------------
+    prefix, numeric, findAll = task
+    state = State(numeric)
+    if findAll:
+        total = countSolutions(state, WORKER_COUNTS)
+        lead = solutionLine(prefix)
+        chunk = []
+        size = 0
+        for solution in enumerateSolutions(state, WORKER_COUNTS):
+            line = " ".join(filter(None, [lead, solutionLine(solution)])) + "\n"
+            if size + len(line) > WRITE_CHUNK:
+                os.write(sys.stdout.fileno(), "".join(chunk).encode())
+                chunk = []
+                size = 0
+            chunk.append(line)
+            size += len(line)
+        if chunk:
+            os.write(sys.stdout.fileno(), "".join(chunk).encode())
+        return total
+    X = backTrackMemo([[None, state]], WORKER_DEAD_STATES, False, WORKER_SYMMETRIES)
+    if 'FAILED' in X:
+        return None
+    return prefix + X
+
+
+def splitRoot(state, count, findAll=False):
+    # -----------------------------------------------------------------
+    # Returns at least count (prefix, State) subtrees covering the search
+    # from state, or as many as exist.  Goal states are not expanded.
+    # Unless findAll, subtrees reached by several move orders are kept
+    # only once.
+    # -----------------------------------------------------------------
+    frontier = [[[], state]]
+    while len(frontier) < count:
+        nextFrontier = []
+        seen = set()
+        expanded = False
+        for prefix, s in frontier:
+            rules = [] if s.goal() else s.applicableRules()
+            if not rules:
+                if s.goal():
+                    nextFrontier.append([prefix, s])
+                continue
+            expanded = True
+            for r in rules:
+                newState = r.applyRule(s)
+                if findAll or newState.numeric not in seen:
+                    seen.add(newState.numeric)
+                    nextFrontier.append([prefix + [[r, newState]], newState])
+        frontier = nextFrontier
+        if not expanded:
+            break
+    return frontier
+
+
+def parallelBackTrack(state, jobs, findAll=False, symmetry=False):
+    # -----------------------------------------------------------------
+    # Searches from state on a pool of jobs processes.  Returns the first
+    # solution any worker finds, terminating the others, or with
+    # findAll, the number of solutions, which the workers write to
+    # standard output in no particular order.  With symmetry, the
+    # workers key their dead states by canonical form.
+    # -----------------------------------------------------------------
+    tasks = [(prefix, s.numeric, findAll)
+             for prefix, s in splitRoot(state, jobs * 4, findAll)]
+    sys.stdout.flush()
+    pool = multiprocessing.Pool(jobs, initWorker,
+                                (BOARD_GEOMETRY, GOAL_STATE.numeric, symmetry))
+    try:
+        if findAll:
+            return sum(pool.imap_unordered(solveSubtree, tasks))
+        for result in pool.imap_unordered(solveSubtree, tasks):
+            if result is not None:
+                return result
+        return "FAILED - 4"
+    finally:
+        pool.terminate()
+
+
+def solveAllPairs(geometry, out, retrograde=False, symmetry=False):
+    # -----------------------------------------------------------------
+    # Solves the board from every start with a single hole to every goal
+    # with a single peg, writing one JSON line per pair to out:
+    #     {"start": hole, "goal": peg, "solvable": ..., "moves": [...],
+    #      "nodes": ...}
+    # where moves lists the [jumper, goner, newpos] of each jump.
+    #
+    # Pairs are solved goal by goal, and all starts for a goal share one
+    # table of dead states, or with retrograde, one solvability table.
+    # -----------------------------------------------------------------
+    global BOARD_GEOMETRY, GOAL_STATE
+    BOARD_GEOMETRY = geometry
+    full = (1 << geometry.size) - 1
+    for goalCell in range(geometry.size):
+        GOAL_STATE = State(1 << goalCell)
+        deadStates = set()
+        solvable = None
+        symmetries = None
+        if retrograde:
+            solvable = solvableTable(geometry, GOAL_STATE.numeric)
+        elif symmetry:
+            symmetries = symmetryGroup(geometry, GOAL_STATE.numeric)
+
+        for startCell in range(geometry.size):
+            initialState = State(full ^ (1 << startCell))
+            stats = SearchStats()
+            if provablyUnsolvable(initialState.numeric, GOAL_STATE.numeric, geometry):
+                X = "FAILED - 6 : Unsolvable"
+            elif solvable:
+                X = iterativeBackTrack(initialState, False, solvable, stats)
+            else:
+                X = backTrackMemo([[None, initialState]], deadStates, False,
+                                  symmetries, stats)
+            record = {"start": startCell, "goal": goalCell,
+                      "solvable": not isinstance(X, str),
+                      "moves": [] if isinstance(X, str) else [r.moveVector for r, st in X],
+                      "nodes": stats.nodes}
+            out.write(json.dumps(record) + "\n")
+
+
+def getConfiguration():
+    # ============================================================================
+    # Returns configuration read from command line.
+    #   python3 pegboard_backtrack.py BOARD_ROWS BOARD_COLS [verbose] [options]
+    #
+    # -m, --method:
+    #   Specifies solution method to use.
+    #   Choices are:
+    #     "b","backtrack" : specifying BACKTRACK (default)
+    #     "t","table"     : specifying MEMO_BACKTRACK (shared path stack and
+    #                       table of dead states)
+    #     "f","flail"     : specifying FLAIL (random moves until stuck)
+    #     "i","iterative" : specifying ITERATIVE (backtracking on an explicit
+    #                       stack instead of recursion)
+    #     "a","best"      : specifying BEST_FIRST (see --heuristic)
+    #     "x","incremental": specifying INCREMENTAL (backtracking on one board
+    #                       whose legal jumps are updated incrementally)
+    #     "m","meet"      : specifying BIDIRECTIONAL (meet-in-the-middle)
+    #     "l","layers"    : specifying LAYERED (NumPy breadth-first layers)
+    #     "c","count"     : specifying COUNT (number of distinct solutions)
+    #     "n","enumerate" : specifying ENUMERATE (print every solution)
+    #
+    # -e, --heuristic:
+    #   Heuristic for BEST_FIRST: "pegs", "spread" (default) or "mobility".
+    #
+    # -s, --symmetry:
+    #   Key the table of dead states by the canonical form of each board
+    #   under the rotations and reflections that fix the goal.  Applies to
+    #   the searches that keep one: TABLE, INCREMENTAL, --jobs (without
+    #   --all) and --batch.
+    #
+    # -r, --retrograde:
+    #   Build the retrograde solvability table first, and let BACKTRACK and
+    #   FLAIL choose only moves that keep the board solvable.  The table has
+    #   one bit per possible board, 2^cells bits: 8 KB for 4x4 and 4 MB for
+    #   5x5, whose table takes minutes to build.  Larger boards are refused
+    #   (RETROGRADE_CELL_LIMIT); use "-m meet" or "-m incremental" there.
+    #
+    # -d, --db DIR:
+    #   Keep the retrograde table in a database file in directory DIR, and
+    #   map it from there on later runs instead of rebuilding it.
+    #
+    # -g, --pagoda:
+    #   Abandon boards whose pagoda function values fall below the goal's,
+    #   or that have an isolated peg.
+    #
+    # -j, --jobs N:
+    #   Split the search near the root and search the subtrees on N
+    #   processes with memoised backtracking (TABLE).  Cannot be combined
+    #   with -m, -e, -r, -d or -g.
+    #
+    # -a, --all:
+    #   With --jobs, write every solution, one per line as with "-m n",
+    #   followed by their number, instead of stopping at the first.
+    #
+    # -p, --playouts N:
+    #   Play N random games from the initial state with NumPy, and report
+    #   the success rate and the distributions of final peg counts and
+    #   dead-end depths.
+    #
+    # -o, --export FILE:
+    #   Write the graph of boards reachable from the initial state to FILE
+    #   (sorted uint64 boards and CSR jump arrays, readable with np.memmap)
+    #   and exit.  Needs NumPy.
+    #
+    # --trace-every N, --trace-depth D, --trace-size K:
+    #   In verbose mode, the searches record each move they try in a trace
+    #   that is printed at the end: only every Nth move is kept, none deeper
+    #   than D, and only the last K (10000 by default).
+    #
+    # -G, --geometry KIND:
+    #   Board geometry: "rect" (default, BOARD_ROWS x BOARD_COLS), "english"
+    #   (33-hole cross), "triangle" or "hex", the last two with the length
+    #   of a side given as BOARD_ROWS (default 5 and 3).  The initial state
+    #   has one hole, and the goal one peg, in the same cell.
+    #
+    # -b, --batch FILE:
+    #   Solve every pair of single-hole start and single-peg goal on the
+    #   board, writing JSON lines to FILE ("-" for standard output).  Uses
+    #   the retrograde table with -r, and symmetries with -s.
+    #
+    # Returns (rows, cols, verbose, method, options), where options maps
+    # the name of each long option given to its value (True for flags).
+    # ============================================================================
+    METHOD = {}
+    METHOD.update(dict.fromkeys(["b", "backtrack"], "BACKTRACK"))
+    METHOD.update(dict.fromkeys(["t", "table"], "MEMO_BACKTRACK"))
+    METHOD.update(dict.fromkeys(["f", "flail"], "FLAIL"))
+    METHOD.update(dict.fromkeys(["i", "iterative"], "ITERATIVE"))
+    METHOD.update(dict.fromkeys(["a", "best"], "BEST_FIRST"))
+    METHOD.update(dict.fromkeys(["x", "incremental"], "INCREMENTAL"))
+    METHOD.update(dict.fromkeys(["m", "meet"], "BIDIRECTIONAL"))
+    METHOD.update(dict.fromkeys(["l", "layers"], "LAYERED"))
+    METHOD.update(dict.fromkeys(["c", "count"], "COUNT"))
+    METHOD.update(dict.fromkeys(["n", "enumerate"], "ENUMERATE"))
+
+    method = "BACKTRACK"
+    options = {}
+
+    opts, args = getopt.gnu_getopt(sys.argv[1:], "m:e:srd:gj:ab:p:G:o:",
+                                   ["method=", "heuristic=", "symmetry", "retrograde",
+                                    "db=", "pagoda", "jobs=", "all", "batch=",
+                                    "playouts=", "geometry=", "export=",
+                                    "trace-every=", "trace-depth=", "trace-size="])
+    for opt, arg in opts:
+        if opt in ("-m", "--method"):
+            if arg not in METHOD:
+                sys.exit("Unknown method: %s" % arg)
+            method = METHOD[arg]
+        elif opt in ("-e", "--heuristic"):
+            if arg not in HEURISTICS:
+                sys.exit("Unknown heuristic: %s" % arg)
+            options["heuristic"] = arg
+        elif opt in ("-s", "--symmetry"):
+            options["symmetry"] = True
+        elif opt in ("-r", "--retrograde"):
+            options["retrograde"] = True
+        elif opt in ("-d", "--db"):
+            options["retrograde"] = True
+            options["db"] = arg
+        elif opt in ("-g", "--pagoda"):
+            options["pagoda"] = True
+        elif opt in ("-j", "--jobs"):
+            options["jobs"] = int(arg)
+        elif opt in ("-a", "--all"):
+            options["all"] = True
+        elif opt in ("-b", "--batch"):
+            options["batch"] = arg
+        elif opt in ("-p", "--playouts"):
+            options["playouts"] = int(arg)
+        elif opt in ("-o", "--export"):
+            options["export"] = arg
+        elif opt == "--trace-every":
+            options["traceEvery"] = int(arg)
+        elif opt == "--trace-depth":
+            options["traceDepth"] = int(arg)
+        elif opt == "--trace-size":
+            options["traceSize"] = int(arg)
+        elif opt in ("-G", "--geometry"):
+            if arg not in GEOMETRY_KINDS:
+                sys.exit("Unknown geometry: %s" % arg)
+            options["geometry"] = arg
+
+    if options.get("all") and not options.get("jobs"):
+        sys.exit("-a needs -j")
+    ignored = [opt for opt, arg in opts
+               if opt in ("-m", "--method", "-e", "--heuristic", "-r", "--retrograde",
+                          "-d", "--db", "-g", "--pagoda")]
+    if options.get("jobs") and ignored:
+        sys.exit("-j searches with memoised backtracking and cannot be combined with %s"
+                 % ", ".join(sorted(set(ignored))))
+
+    if options.get("symmetry") and not options.get("batch") and \
+            not (options.get("jobs") and not options.get("all")) and \
+            method not in ("MEMO_BACKTRACK", "INCREMENTAL"):
+        sys.exit("-s only applies to -m table, -m incremental, -j and -b")
+
+    rows = int(args[0]) if len(args) > 0 else 1
+    cols = int(args[1]) if len(args) > 1 else 1
+    verbose = len(args) > 2 and args[2] == "verbose"
+    return rows, cols, verbose, method, options
+
+
 # --------------------------------------------------------------------------------
 # --------------------------------------------------------------------------------
 #  MAIN PROGRAM
@@ -288,12 +2137,37 @@ if __name__ == "__main__":
     #
     #       sets the size of the grid, e.g.,
     #    python3 pegboard_base.py 4 4
+    #
+    #    python3 pegboard_backtrack.py 5 5 -m table
+    #
+    #       solves a 5x5 board with the memoised backtracking search.
+    #       See getConfiguration() for further options.
     # --------------------------------------------------------------------------------
 
-    BOARD_ROWS = int(get_arg(1))
-    BOARD_COLS = int(get_arg(2))
-    verbose = str(get_arg(3))
-    verbose = (verbose == "verbose")
+    BOARD_ROWS, BOARD_COLS, verbose, method, options = getConfiguration()
+    kind = options.get("geometry", "rect")
+    if kind == "rect":
+        BOARD_GEOMETRY = boardGeometry(kind, BOARD_ROWS, BOARD_COLS)
+    elif kind == "english" or BOARD_ROWS == 1:
+        BOARD_GEOMETRY = boardGeometry(kind)
+    else:
+        BOARD_GEOMETRY = boardGeometry(kind, BOARD_ROWS)
+
+    if options.get("retrograde") and BOARD_GEOMETRY.size > RETROGRADE_CELL_LIMIT:
+        print("-r: %d cells is too many for a retrograde table (at most %d, 4 MB); "
+              "try -m meet or -m incremental" % (BOARD_GEOMETRY.size, RETROGRADE_CELL_LIMIT))
+        sys.exit(1)
+
+    if options.get("batch"):
+        if options["batch"] == "-":
+            solveAllPairs(BOARD_GEOMETRY, sys.stdout,
+                          options.get("retrograde", False), options.get("symmetry", False))
+        else:
+            with open(options["batch"], "w") as out:
+                solveAllPairs(BOARD_GEOMETRY, out,
+                              options.get("retrograde", False), options.get("symmetry", False))
+        sys.exit(0)
+
     # BOARD_ROWS = 4
     # BOARD_COLS = 4
     # -----------------------------------------------------------------
@@ -306,7 +2180,7 @@ if __name__ == "__main__":
     pegValue = 1
     FULL_BOARD = 0
 
-    for i in range(BOARD_ROWS*BOARD_COLS):
+    for i in range(BOARD_GEOMETRY.size):
         peg.append(pegValue)
         FULL_BOARD += pegValue
         pegValue += pegValue
@@ -316,11 +2190,11 @@ if __name__ == "__main__":
     #     # TESTING:
     # -----------------------------------------------------------------
     print("\nFULL_BOARD = %d" % FULL_BOARD)
-    GOAL_STATE = peg[9]
+    GOAL_STATE = peg[BOARD_GEOMETRY.hole]
     print("\nGOAL_STATE = %s" % GOAL_STATE)
     GOAL_STATE = State(GOAL_STATE)
     print(GOAL_STATE.goal())
-    initialState = FULL_BOARD - (peg[9])
+    initialState = FULL_BOARD - (peg[BOARD_GEOMETRY.hole])
     print("\ninitialState = %s" % initialState)
     initialState = State(initialState)
 
@@ -333,13 +2207,107 @@ if __name__ == "__main__":
 
     # for r in rules:
     #     print(r)
-    list = [initialState]
-    path = backTrack(list, verbose)
-    for i in path:
-        print(i[0], "STATE REACHED:",  i[1].numeric)
-    # print(flailWildly(initialState))
+    if provablyUnsolvable(initialState.numeric, GOAL_STATE.numeric, BOARD_GEOMETRY):
+        print("initialState provably cannot reach GOAL_STATE (position classes)")
+        sys.exit(0)
+
+    solvable = None
+    if options.get("retrograde"):
+        if options.get("db"):
+            solvable = openSolvableTable(options["db"], BOARD_GEOMETRY,
+                                         GOAL_STATE.numeric)
+        else:
+            solvable = solvableTable(BOARD_GEOMETRY, GOAL_STATE.numeric)
+        if not isSolvable(initialState.numeric, solvable):
+            print("initialState cannot reach GOAL_STATE")
+
+    trace = None
+    if verbose:
+        trace = Trace(options.get("traceSize", 10000), options.get("traceEvery", 1),
+                      options.get("traceDepth"))
+
+    if options.get("export"):
+        nodes, edges = exportStateGraph(initialState, options["export"])
+        print("Wrote %d boards and %d jumps to %s" % (nodes, edges, options["export"]))
+        sys.exit(0)
+
+    if options.get("playouts"):
+        results = bulkPlayouts(initialState, options["playouts"])
+        print("Games: %d, reached GOAL_STATE: %d (%.4f)"
+              % (results["games"], results["successes"], results["successRate"]))
+        print("Final peg counts:", results["finalPegs"])
+        print("Dead-end depths:", results["deadEndDepth"])
+        sys.exit(0)
+
+    pagodas = None
+    if options.get("pagoda"):
+        pagodas = pagodaTable(BOARD_GEOMETRY, GOAL_STATE.numeric)
+
+    symmetries = None
+    if options.get("symmetry"):
+        symmetries = symmetryGroup(BOARD_GEOMETRY, GOAL_STATE.numeric)
+        print("%d symmetries fix GOAL_STATE" % len(symmetries))
+        if not len(symmetries):
+            print("-s has no effect: dead states are keyed as they are")
+
+    if method == "COUNT":
+        counts = {}
+        print("%d solutions" % countSolutions(initialState, counts))
+        print("%d boards counted" % len(counts))
+        sys.exit(0)
+    if method == "ENUMERATE":
+        for solution in enumerateSolutions(initialState):
+            print(solutionLine(solution))
+        sys.exit(0)
+    if options.get("jobs") and options.get("all"):
+        total = parallelBackTrack(initialState, options["jobs"], True)
+        print("%d solutions" % total)
+        sys.exit(0)
 
-    # print(backTrack([initialState]))
+    if options.get("jobs"):
+        path = parallelBackTrack(initialState, options["jobs"],
+                                 symmetry=options.get("symmetry", False))
+    elif method == "FLAIL":
+        path = flailWildly(initialState, solvable, pagodas)
+    elif method == "ITERATIVE":
+        stats = SearchStats()
+        path = iterativeBackTrack(initialState, trace, solvable, stats, pagodas)
+        print(stats)
+    elif method == "INCREMENTAL":
+        stats = SearchStats()
+        path = incrementalBackTrack(initialState, trace, set(), stats, symmetries)
+        print(stats)
+    elif method == "BIDIRECTIONAL":
+        stats = SearchStats()
+        path = bidirectional(initialState, stats)
+        print(stats)
+    elif method == "LAYERED":
+        stats = SearchStats()
+        layers = layeredBFS(initialState, stats)
+        for depth, layer in enumerate(layers):
+            print("Layer %d: %d boards" % (depth, layer.size))
+        path = layeredPath(initialState, layers)
+        print(stats)
+    elif method == "BEST_FIRST":
+        heuristic = heuristicFunction(options.get("heuristic", "spread"),
+                                      BOARD_GEOMETRY, GOAL_STATE.numeric)
+        stats = SearchStats()
+        path = bestFirst(initialState, heuristic, trace, stats, pagodas)
+        print(stats)
+    elif method == "MEMO_BACKTRACK":
+        stats = SearchStats()
+        path = backTrackMemo([[None, initialState]], set(), trace, symmetries,
+                             stats, pagodas)
+        print(stats)
+    else:
+        path = backTrack([initialState], trace, solvable, pagodas)
+    if trace:
+        trace.dump()
+    if isinstance(path, str):
+        print(path)
+    else:
+        for i in path:
+            print(i[0], "STATE REACHED:",  i[1].numeric)
 
 # -----------------------------------------------------------------
 
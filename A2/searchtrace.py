@@ -0,0 +1,84 @@
+# --------------------------------------------------------------------------------
+# Search tracing
+#
+# A trace sink for the search functions.  Instead of printing every node,
+# a search records each event as a tuple of the objects involved (a rule,
+# a state, a result string ...) into a ring buffer holding only the most
+# recent events.  Nothing is converted to text until dump() is called, so
+# a trace can be left on without the printing dominating the search.
+#
+#    trace = Trace(capacity=1000, every=10, maxDepth=5)
+#    backTrack([initialState], trace)      # records events via trace.record
+#    trace.dump()                          # prints the buffered events
+#
+# every keeps one event in N (sampling) and maxDepth drops events deeper
+# than the given depth, both before anything is stored.
+# --------------------------------------------------------------------------------
+
+import collections
+import sys
+
+
+class Trace:
+
+    # ----------------------------------------------------------------------------
+    # Trace:
+    # ----------------------------------------------------------------------------
+    # events holds (seq, depth, fields) for the last `capacity` events
+    # kept, seq being the number of the event among all those offered.
+    # offered and kept count the events passed to record and stored.
+    # ----------------------------------------------------------------------------
+
+    def __init__(self, capacity=10000, every=1, maxDepth=None):
+        self.events = collections.deque(maxlen=capacity)
+        self.every = every
+        self.maxDepth = maxDepth
+        self.offered = 0
+        self.kept = 0
+
+    def __bool__(self):
+        # a trace is always switched on, even before it holds any events
+        return True
+
+    def __len__(self):
+        return len(self.events)
+
+    def record(self, depth, *fields):
+        # -----------------------------------------------------------------
+        # Records an event at the given search depth.  The fields are kept
+        # as they are and only formatted by dump, so they must not change
+        # after they are recorded: pass a copy of anything the search goes
+        # on to modify in place.
+        # -----------------------------------------------------------------
+        self.offered += 1
+        if self.maxDepth is not None and depth > self.maxDepth:
+            return
+        if self.offered % self.every:
+            return
+        self.kept += 1
+        self.events.append((self.offered, depth, fields))
+
+    def clear(self):
+        self.events.clear()
+        self.offered = 0
+        self.kept = 0
+
+    def lines(self):
+        # -----------------------------------------------------------------
+        # Generates one line of text per buffered event, oldest first.
+        # -----------------------------------------------------------------
+        for seq, depth, fields in self.events:
+            yield "%d [depth %d] %s" % (seq, depth, " | ".join(str(f) for f in fields))
+
+    def dump(self, out=None):
+        # -----------------------------------------------------------------
+        # Writes the buffered events to out (standard output by default),
+        # with a summary line when events were sampled, filtered or have
+        # fallen out of the buffer.
+        # -----------------------------------------------------------------
+        if out is None:
+            out = sys.stdout
+        for line in self.lines():
+            out.write(line + "\n")
+        if len(self.events) < self.offered:
+            out.write("(%d of %d events shown)\n" % (len(self.events), self.offered))
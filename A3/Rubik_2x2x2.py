@@ -1,3 +1,4 @@
+import itertools
 import random
 import copy
 from re import L
@@ -5,6 +6,7 @@ from sre_constants import FAILURE
 import sys, getopt
 from tabnanny import verbose
 import time
+from searchtrace import Trace
 
 
 def get_arg(index, default=None):
@@ -38,7 +40,12 @@ def getConfiguration():
     # 	  n>=0               : specifying DEPTH_FIRST with MAX_DEPTH=n
     #
     # -v, --verbose:
-    #  Indicates VERBOSE mode for detailed algorithm tracing
+    #  Indicates VERBOSE mode for detailed algorithm tracing.  The searches
+    #  record each node in a trace that is printed when they finish.
+    #
+    # --trace-every N, --trace-depth D, --trace-size K:
+    #  In VERBOSE mode, keep only every Nth node of the trace, none deeper
+    #  than D, and only the last K (10000 by default).
     #
     # Examples:
     #
@@ -83,11 +90,16 @@ def getConfiguration():
     method = "DEPTH_FIRST"  # default method
     MAX_DEPTH = 1  # default maximum depth
     VERBOSE = False
+    traceOptions = {}
     commandLineErrors = False
 
     goalState = Cube()  # by default, Cube() is the goal state
 
-    opts, args = getopt.getopt(sys.argv[1:], "c:m:v", ["config=", "method=", "verbose"])
+    opts, args = getopt.getopt(
+        sys.argv[1:],
+        "c:m:v",
+        ["config=", "method=", "verbose", "trace-every=", "trace-depth=", "trace-size="],
+    )
     for opt, arg in opts:
         if opt in ("-c", "--config"):
             # ==============================================================
@@ -104,7 +116,11 @@ def getConfiguration():
                 NUM_STEPS = int(arg)
                 initialState = goalState.shuffle(NUM_STEPS)
             else:
-                initialState = Cube(arg)
+                try:
+                    initialState = Cube(arg)
+                except ValueError as e:
+                    print(e)
+                    commandLineErrors = True
 
         elif opt in ("-m", "--method"):
             # ==============================================================
@@ -121,6 +137,15 @@ def getConfiguration():
         elif opt in ("-v", "--verbose"):
             VERBOSE = True
 
+        elif opt == "--trace-every":
+            traceOptions["every"] = int(arg)
+
+        elif opt == "--trace-depth":
+            traceOptions["maxDepth"] = int(arg)
+
+        elif opt == "--trace-size":
+            traceOptions["capacity"] = int(arg)
+
         else:
             print("Unknown option, " + opt + " " + str(arg))
             commandLineErrors = True
@@ -128,7 +153,8 @@ def getConfiguration():
     if commandLineErrors:
         sys.exit()
 
-    return initialState, method, MAX_DEPTH, VERBOSE
+    trace = Trace(**traceOptions) if VERBOSE else None
+    return initialState, method, MAX_DEPTH, VERBOSE, trace
 
 
 # --------------------------------------------------------------------------------
@@ -456,21 +482,248 @@ RULES = {
     ],
 }
 
+# ============================================================================
+# Integer encoding
+#
+# A cube is held as three integers instead of its 24 tiles:
+#   perm   (0..5039): which cubie sits in each of 7 corner positions
+#   orient (0..728) : how each of the first 6 of them is twisted (the 7th
+#                     twist follows, the twists summing to 0 mod 3)
+#   rot    (0..23)  : the whole-cube rotation that the cube is seen in
+# the 8th corner (FIXED) always holding its own cubie untwisted, in the
+# frame given by rot.  Everything below is derived from RULES and the
+# solved tiles, at import.
+#
+# The moves not touching FIXED (FRAME_RULES) act on perm and orient
+# through PERM_MOVES and ORIENT_MOVES; the other moves are the turn of
+# the opposite face plus a rotation, which MOVES gives for each rot.
+# A cube is solved, in whatever rotation, when perm and orient are 0.
+# ============================================================================
+
+SOLVED_TILES = "WWWWRRRRGGGGYYYYOOOOBBBB"
+UD_FACES = (0, 3)  # faces of the W and Y tiles, which fix a corner's twist
+
+
+def permute(tiles, rule):
+    # new tile i is old tile rule[i]
+    return [tiles[i] for i in rule]
+
+
+def compose(first, then):
+    # the permutation doing first, then then
+    return [first[i] for i in then]
+
+
+def inverse(rule):
+    result = [0] * len(rule)
+    for i, j in enumerate(rule):
+        result[j] = i
+    return result
+
+
+# ============================================================================
+# Corner positions: the tiles of a corner are those fixed by the same
+# moves.  Each is ordered from its U/D tile, going round the corner in
+# the same sense for all of them (moves are rotations, so carrying one
+# corner's order along the moves keeps the sense).
+# ============================================================================
+def cornerPositions():
+    groups = {}
+    for i in range(24):
+        fixedBy = frozenset(m for m in RULES if RULES[m][i] == i)
+        groups.setdefault(fixedBy, []).append(i)
+    corners = sorted(groups.values())
+
+    def fromUD(order):
+        while order[0] // 4 not in UD_FACES:
+            order = order[1:] + order[:1]
+        return tuple(order)
+
+    orders = {0: fromUD(corners[0])}
+    stack = [0]
+    while stack:
+        c = orders[stack.pop()]
+        for m in RULES:
+            moved = inverse(RULES[m])
+            image = [moved[i] for i in c]
+            d = next(k for k in range(len(corners)) if image[0] in corners[k])
+            if d not in orders:
+                orders[d] = fromUD(image)
+                stack.append(d)
+    return [orders[k] for k in range(len(corners))]
+
+
+CORNERS = cornerPositions()
+# the corner on the D, L and B faces stays put in the encoding
+FIXED = next(k for k, c in enumerate(CORNERS) if sorted(i // 4 for i in c) == [3, 4, 5])
+CORNERS.append(CORNERS.pop(FIXED))
+FIXED = 7
+CUBIES = [tuple(SOLVED_TILES[i] for i in c) for c in CORNERS]
+FRAME_RULES = [m for m in RULES if all(RULES[m][i] == i for i in CORNERS[FIXED])]
+
+
+# ============================================================================
+# The 24 whole-cube rotations, as tile permutations: turning two
+# opposite faces in the same sense turns the whole cube.
+# ============================================================================
+def cubeRotations():
+    axes = [compose(RULES["R"], RULES["L'"]), compose(RULES["U"], RULES["D'"]),
+            compose(RULES["F"], RULES["B'"])]
+    rotations = [list(range(24))]
+    for r in rotations:
+        for a in axes:
+            t = compose(r, a)
+            if t not in rotations:
+                rotations.append(t)
+    return rotations
+
+
+ROTATIONS = cubeRotations()
+UNROTATIONS = [inverse(r) for r in ROTATIONS]
+
+PERMS = list(itertools.permutations(range(7)))
+PERM_INDEX = {p: i for i, p in enumerate(PERMS)}
+
+
+def orientIndex(twists):
+    return sum(t * 3 ** k for k, t in enumerate(twists[:6]))
+
+
+def orientTwists(orient):
+    twists = [orient // 3 ** k % 3 for k in range(6)]
+    return twists + [-sum(twists) % 3]
+
+
+def encode(tiles):
+    # ============================================================================
+    # Returns (perm, orient, rot) for the 24 tiles, or raises ValueError if
+    # they are not those of a 2x2x2 cube.
+    # ============================================================================
+    for rot, unrotation in enumerate(UNROTATIONS):
+        frame = permute(tiles, unrotation)
+        if tuple(frame[i] for i in CORNERS[FIXED]) == CUBIES[FIXED]:
+            break
+    else:
+        raise ValueError("Not a 2x2x2 cube: " + "".join(tiles))
+    perm = []
+    twists = []
+    for c in CORNERS[:FIXED]:
+        colours = tuple(frame[i] for i in c)
+        for t in range(3):
+            turned = colours[t:] + colours[:t]
+            if turned in CUBIES[:FIXED]:
+                perm.append(CUBIES.index(turned))
+                twists.append(t)
+                break
+        else:
+            raise ValueError("Not a 2x2x2 cube: " + "".join(tiles))
+    if tuple(perm) not in PERM_INDEX or sum(twists) % 3:
+        raise ValueError("Not a 2x2x2 cube: " + "".join(tiles))
+    return PERM_INDEX[tuple(perm)], orientIndex(twists), rot
+
+
+def decode(perm, orient, rot):
+    # ============================================================================
+    # Returns the 24 tiles, as a string, of the cube (perm, orient, rot).
+    # ============================================================================
+    frame = list(SOLVED_TILES)
+    for c, cubie, t in zip(CORNERS, PERMS[perm], orientTwists(orient)):
+        colours = CUBIES[cubie]
+        for k in range(3):
+            frame[c[(k + t) % 3]] = colours[k]
+    return "".join(permute(frame, ROTATIONS[rot]))
+
+
+# ============================================================================
+# The tiles of each face as (corner, slot) pairs, and the twists of all 8
+# corners for each orient, so colours can be read from perm and orient
+# without decoding the cube.  Whether a face is one colour does not
+# depend on rot, which only moves the faces around.
+# ============================================================================
+FACE_SLOTS = [[next((k, c.index(i)) for k, c in enumerate(CORNERS) if i in c)
+               for i in range(4 * face, 4 * face + 4)] for face in range(6)]
+TWISTS = [orientTwists(orient) + [0] for orient in range(3 ** 6)]
+
+
+def solvedFaces(perm, orient):
+    # ============================================================================
+    # Returns the number of faces of one colour on the cube (perm, orient).
+    # ============================================================================
+    cubies = PERMS[perm] + (FIXED,)
+    twists = TWISTS[orient]
+    count = 0
+    for face in FACE_SLOTS:
+        k, j = face[0]
+        colour = CUBIES[cubies[k]][(j - twists[k]) % 3]
+        for k, j in face[1:]:
+            if CUBIES[cubies[k]][(j - twists[k]) % 3] != colour:
+                break
+        else:
+            count += 1
+    return count
+
+
+# ============================================================================
+# Move tables.  A move sends the cubie in corner c to corner CORNER_MOVES[m][c]
+# and adds TWIST_MOVES[m][c] to its twist.
+# ============================================================================
+CORNER_MOVES = {}
+TWIST_MOVES = {}
+for m in FRAME_RULES:
+    moved = inverse(RULES[m])
+    CORNER_MOVES[m] = []
+    TWIST_MOVES[m] = []
+    for c in CORNERS:
+        d = next(k for k in range(8) if moved[c[0]] in CORNERS[k])
+        CORNER_MOVES[m].append(d)
+        TWIST_MOVES[m].append(CORNERS[d].index(moved[c[0]]))
+
+PERM_MOVES = {}
+ORIENT_MOVES = {}
+for m in FRAME_RULES:
+    to = CORNER_MOVES[m]
+    table = []
+    for p in PERMS:
+        q = [0] * 7
+        for c in range(7):
+            q[to[c]] = p[c]
+        table.append(PERM_INDEX[tuple(q)])
+    PERM_MOVES[m] = table
+    table = []
+    for orient in range(3 ** 6):
+        twists = orientTwists(orient)
+        u = [0] * 7
+        for c in range(7):
+            u[to[c]] = (twists[c] + TWIST_MOVES[m][c]) % 3
+        table.append(orientIndex(u))
+    ORIENT_MOVES[m] = table
+
+# ============================================================================
+# MOVES[rot][rule] is (frameRule, newRot): rule applied to a cube seen in
+# rotation rot is frameRule in the cube's own frame, after which the cube
+# is seen in rotation newRot.
+# ============================================================================
+MOVES = []
+for rot, rotation in enumerate(ROTATIONS):
+    entry = {}
+    for m in RULES:
+        turned = compose(rotation, RULES[m])
+        entry[m] = next((f, r) for f in FRAME_RULES for r, rr in enumerate(ROTATIONS)
+                        if compose(RULES[f], rr) == turned)
+    MOVES.append(entry)
+
+
 # --------------------------------------------------------------------------------
 class Cube:
     def __init__(self, config="WWWW RRRR GGGG YYYY OOOO BBBB"):
 
         # ============================================================================
-        # This code ensures that tiles is a string without spaces in it, and
-        # string is a more readable version with spaces in it, as in the default
-        # argument.  The user may initialize Cube with a string in either form.
-        # ============================================================================
-        self.tiles = config.replace(" ", "")
-        # ============================================================================
-        # separate tiles into chunks of size 4 and insert a space between them
+        # The cube is held as (perm, orient, rot) (see encode), index being
+        # perm and orient together.  The user may initialize Cube with a
+        # string of tiles with or without spaces, as in the default argument.
         # ============================================================================
-        chunks = [self.tiles[i : i + 4] + " " for i in range(0, len(self.tiles), 4)]
-        self.config = "".join(chunks)
+        self.perm, self.orient, self.rot = encode(config.replace(" ", ""))
+        self.index = self.perm * 729 + self.orient
 
         self.depth = 0
         self.rule = ""
@@ -484,7 +737,25 @@ class Cube:
         return self.config
 
     def __eq__(self, state):
-        return (self.tiles == state.tiles) or (self.config == state.config)
+        return self.index == state.index and self.rot == state.rot
+
+    def __hash__(self):
+        return hash((self.index, self.rot))
+
+    @property
+    def tiles(self):
+        # ============================================================================
+        # The tiles as a string without spaces in it.
+        # ============================================================================
+        return decode(self.perm, self.orient, self.rot)
+
+    @property
+    def config(self):
+        # ============================================================================
+        # The tiles in chunks of size 4 with a space after each.
+        # ============================================================================
+        tiles = self.tiles
+        return "".join(tiles[i : i + 4] + " " for i in range(0, len(tiles), 4))
 
     def toGrid(self):
         # ============================================================================
@@ -535,39 +806,16 @@ class Cube:
         return list(RULES.keys())
 
     def applyRule(self, rule):
-        x = ""
         if rule in RULES:
-            for i in RULES[rule]:
-                x += self.tiles[i]
-        self.tiles = x
-        chunks = [self.tiles[i : i + 4] + " " for i in range(0, len(self.tiles), 4)]
-        self.config = "".join(chunks)
-
-        return self  # change this!
-
-    def applyrule(self, rule):
-        rules = RULES.get(rule)
-        new_tiles = [None] * len(rules)
-        x = []
-        i = 0
-        for num in rules:
-            new_tiles[i] = self.tiles[num]
-            i = i + 1
-        index = 0
-        while index + 4 <= 24:
-            x.append(new_tiles[index : index + 4])
-            index = index + 4
-        self.config = [None] * len(x)
-        i = 0
-        for each in x:
-            self.config[i] = "".join(each)
-            i = i + 1
-
-        self.tiles = "".join(self.config)
-        self.config = " ".join(self.config)
+            frameRule, self.rot = MOVES[self.rot][rule]
+            self.perm = PERM_MOVES[frameRule][self.perm]
+            self.orient = ORIENT_MOVES[frameRule][self.orient]
+            self.index = self.perm * 729 + self.orient
 
         return self
 
+    applyrule = applyRule
+
     # def applyRule(self, rule):
     #     rules = RULES.get(rule)
     #     new_tiles = [None] * len(rules)
@@ -599,18 +847,18 @@ class Cube:
         return self
 
     def goal(self):
-        for i in self.config.split():
-            for x in i:
-                if i.count(x) != 4:
-                    return False
-                else:
-                    break
-        return True
+        return self.index == 0
 
 
 generatedNodes = 0
 expandedNodes = 0
 
+# ============================================================================
+# Trace of the nodes visited by the searches in VERBOSE mode (see
+# searchtrace.Trace), or None.
+# ============================================================================
+TRACE = None
+
 
 def graphsearch(L, h=False):  # Breadth-First and Best-First when h(heuristic) is True
     open = [L]
@@ -626,6 +874,8 @@ def graphsearch(L, h=False):  # Breadth-First and Best-First when h(heuristic) i
         start = open.pop(0)
         closed.append(copy.deepcopy(start))
         expandedNodes += 1
+        if TRACE:
+            TRACE.record(start.depth, start.rule, copy.copy(start))
         if start.goal():
             print(start)
             if not h:
@@ -689,17 +939,8 @@ def argmin(state1, state2):
 
 
 def heuristic(state):
-    length = len(state.tiles)
-    score = length // 4
-    for i in range(0, length, 4):
-        if (
-            state.tiles[i]
-            == state.tiles[i + 1]
-            == state.tiles[i + 2]
-            == state.tiles[i + 3]
-        ):
-            score -= 1
-    return score
+    # number of faces not yet of one colour
+    return 6 - solvedFaces(state.perm, state.orient)
 
 
 path = []
@@ -710,7 +951,7 @@ btcalls = 0
 
 def backTrack(stateList, verbose, maxDepth):
     first = stateList[0]
-    visited = []
+    visited = set()
     global btcalls
     global path
 
@@ -719,23 +960,20 @@ def backTrack(stateList, verbose, maxDepth):
         return True
     if maxDepth <= len(stateList):
         return False
-    if first.config in visited:
+    if (first.index, first.rot) in visited:
         return False
     if first in stateList[1:]:
         return False
 
     for r in first.applicableRules():
         newState = first.applyrule(r)
-        if VERBOSE:
-            print("RULE being applied", r)
-            print("Current state is", newState)
-            print("Current Depth is", maxDepth)
-            print("Backtrack calls", btcalls)
+        if TRACE:
+            TRACE.record(len(stateList), r, copy.copy(newState), maxDepth, btcalls)
 
         if newState.goal():
             return True
-        if newState.config not in visited:
-            visited.append(str(newState.config))
+        if (newState.index, newState.rot) not in visited:
+            visited.add((newState.index, newState.rot))
             newStateList = copy.deepcopy(stateList)
             newStateList = [newState] + stateList
             btcalls += 1
@@ -776,6 +1014,8 @@ def dfs(state, maxDepth):
         start = open.pop(0)
         closed.append(copy.deepcopy(start))
         expandedNodes += 1
+        if TRACE:
+            TRACE.record(start.depth, start.rule, copy.copy(start))
 
         if start.goal():
             print("Final State", start)
@@ -848,7 +1088,7 @@ if __name__ == "__main__":
     # See definition of getConfiguration() above for further details, examples.
     # ============================================================================
 
-    initialState, method, MAX_DEPTH, VERBOSE = getConfiguration()
+    initialState, method, MAX_DEPTH, VERBOSE, TRACE = getConfiguration()
 
     print("initialState=" + str(initialState))
 
@@ -931,4 +1171,7 @@ if __name__ == "__main__":
             elif user == 4:
                 method = "IT_BACKTRACK"
 
+    if TRACE:
+        TRACE.dump()
+
     # backTrack([state], True, 100)